@@ -5,24 +5,23 @@ import sys
 import os
 import re
 import math
-import readline
-import hashlib
-import binascii
-import colorsys
-import calendar
-import base64
 import time
 import datetime
-import random
-import argparse
+import io
+import ast
+import operator
+import itertools
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
 
 NAME="Calculus"
 VER="1.0.2"
-OLD=0
 MAX_HISTORY=100
-readline.set_history_length(MAX_HISTORY)
-ECHO = 1
-STORE = {}
+CACHE_SIZE=256
+DATE_CACHE_SIZE=4096
+BATCH_CHUNK=65536
 
 COLORS = {
     'black': '\033[30m',
@@ -52,15 +51,16 @@ NOCOLORS = {
     'underline': '\033[4m'
 }
 
-CL = {}
+# no escape codes at all, for output read by programs (--serve)
+PLAINCOLORS = dict.fromkeys(COLORS, '')
 
 # --- Tab Completion Setup ---
 STRING_FUNCTIONS = [
-        'md5', 'sha256', 'crc32', 'hex2rgb', 'rgb2hex', 
-        'rgb2hsl', 'hsl2rgb', 'len', 'length', 'repeat',
+        'md5', 'sha256', 'crc32', 'hash', 'hashfile', 'hex2rgb', 'rgb2hex', 
+        'rgb2hsl', 'hsl2rgb', 'palette', 'len', 'length', 'repeat',
         'base64', 'decodebase64', 'weekday', 'monthdays','ask',
-        'ss','rs','store','restore','file','print','write','set',
-        'daysbetween','adddays','dayofyear','weeknumber','weekend',
+        'ss','rs','store','restore','file','print','write','set','save','load',
+        'daysbetween','adddays','dayofyear','weeknumber','weekend','businessdays','weekends',
         'date2unix', 'unix2date', 'unix2gregorian', 'unix2julian'
     ]
 COMMANDS = [
@@ -69,7 +69,8 @@ COMMANDS = [
     'shl', 'shr', 'wavelength', 'ss','rs','hex',
     'roman', 'random', 'var', 'remove','list','ls',
     'convert','result','tau','phi', 'tool','command','operation','convert','pixel',
-    'quit', 'exit', 'help','big','clear', 'addpercent','subpercent','prime'
+    'quit', 'exit', 'help','big','clear', 'addpercent','subpercent','prime','cache','mode',
+    'factor','nextprime','primes'
 ]
 
 def getfiles():
@@ -80,10 +81,242 @@ def getfiles():
     return files
 
 COMMANDS.extend(STRING_FUNCTIONS)
-COMMANDS.extend(getfiles())
 
 # store values to variables
 
+# variable name -> slot, shared by every store and by compiled expressions
+SYMBOLS = {}
+SYMBOLS_LOCK = threading.Lock()
+UNSET = object()
+
+def symbol(name):
+    """Slot of a variable name, allocated on first use"""
+    slot = SYMBOLS.get(name)
+    if slot is None:
+        with SYMBOLS_LOCK:
+            slot = SYMBOLS.get(name)
+            if slot is None:
+                slot = SYMBOLS[name] = len(SYMBOLS)
+    return slot
+
+def pack(value):
+    """
+    Pack a list of only ints or only floats into an array, anything else as
+    is. Mixed lists stay lists, so no int is rounded to a float.
+    """
+    if type(value) is not list or not value:
+        return value
+    kinds = set(map(type, value))
+    try:
+        if kinds == {int}:
+            return array('q', value)
+        if kinds == {float}:
+            return array('d', value)
+    except OverflowError:
+        pass
+    return value
+
+def unpack(value):
+    """A stored value as it was given: packed lists back as lists"""
+    return value.tolist() if type(value) is array else value
+
+STORE_VERSIONS = itertools.count()
+
+class VariableStore(MutableMapping):
+    """
+    Stored variables. Values live in a list indexed by the slot of their
+    name, so compiled expressions read them without a dict lookup. Numbers
+    keep their type and lists of numbers are kept as arrays, read back as
+    lists. `packed` gives the stored array itself.
+    `version` changes on every update, and is never shared by two stores.
+    """
+    def __init__(self):
+        self.values = []
+        self.count = 0
+        self.version = next(STORE_VERSIONS)
+
+    def slot_value(self, slot):
+        values = self.values
+        return unpack(values[slot]) if slot < len(values) else UNSET
+
+    def packed(self, name, default=None):
+        slot = SYMBOLS.get(name)
+        if slot is not None and slot < len(self.values):
+            value = self.values[slot]
+            if value is not UNSET:
+                return value
+        return default
+
+    def get(self, name, default=None):
+        return unpack(self.packed(name, default))
+
+    def __getitem__(self, name):
+        value = self.get(name, UNSET)
+        if value is UNSET:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return self.get(name, UNSET) is not UNSET
+
+    def __setitem__(self, name, value):
+        slot = symbol(name)
+        values = self.values
+        if slot >= len(values):
+            values.extend([UNSET] * (slot + 1 - len(values)))
+        if values[slot] is UNSET:
+            self.count += 1
+        values[slot] = pack(value)
+        self.version = next(STORE_VERSIONS)
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self.values[SYMBOLS[name]] = UNSET
+        self.count -= 1
+        self.version = next(STORE_VERSIONS)
+
+    def __iter__(self):
+        values = self.values
+        return iter([name for name, slot in SYMBOLS.items()
+                     if slot < len(values) and values[slot] is not UNSET])
+
+    def __len__(self):
+        return self.count
+
+    def update(self, other=(), **kwargs):
+        """Set many variables at once, ex. when loading a session"""
+        items = list(other.items() if hasattr(other, 'items') else other) + list(kwargs.items())
+        slots = [symbol(name) for name, _ in items]
+        values = self.values
+        if slots and max(slots) >= len(values):
+            values.extend([UNSET] * (max(slots) + 1 - len(values)))
+        for slot, (_, value) in zip(slots, items):
+            if values[slot] is UNSET:
+                self.count += 1
+            values[slot] = pack(value)
+        self.version = next(STORE_VERSIONS)
+
+    def clear(self):
+        self.values = []
+        self.count = 0
+        self.version = next(STORE_VERSIONS)
+
+# --- Sessions of evaluation state ---
+
+class Session:
+    """
+    Evaluation state: stored variables, last result, echo flag, color table
+    and pending ask() answers. Each thread evaluates in its current session,
+    the default one unless a session is entered with `with`. The numeric
+    mode, caches and functions from script defs stay shared.
+    """
+    def __init__(self, colors=None, echo=1):
+        self.store = VariableStore()
+        self.old = 0
+        self.echo = echo
+        self.cl = NOCOLORS if colors is None else colors
+        self.answers = []
+        # False when serving requests, where nothing may use the terminal
+        self.terminal = True
+
+    def __enter__(self):
+        CURRENT.outer.append(CURRENT.session)
+        CURRENT.session = self
+        return self
+
+    def __exit__(self, *exc):
+        CURRENT.session = CURRENT.outer.pop()
+
+    def calculate(self, expr):
+        """Evaluate a line in this session, raising on errors"""
+        with self:
+            return calculate(expr)
+
+    def evaluate(self, expr):
+        """Evaluate a line in this session, errors as a message"""
+        with self:
+            return evaluate_expression(expr)
+
+    def format(self, result):
+        """Format a result with this session's colors, keeping numbers as the last result"""
+        with self:
+            return format_result(result)
+
+    def run_file(self, filename, verbose=False):
+        with self:
+            run_file(filename, verbose)
+
+class CurrentSession(threading.local):
+    """
+    The session entered by each thread, None for the default one, and the
+    sessions it entered before, restored on exit
+    """
+    session = None
+
+    def __init__(self):
+        self.outer = []
+
+CURRENT = CurrentSession()
+DEFAULT_SESSION = Session()
+
+def session():
+    """The session of the calling thread"""
+    current = CURRENT.session
+    return DEFAULT_SESSION if current is None else current
+
+class CurrentStore(MutableMapping):
+    """STORE: the variable store of the current session"""
+    def __getattr__(self, name):
+        return getattr(session().store, name)
+
+    def get(self, name, default=None):
+        return session().store.get(name, default)
+
+    def __getitem__(self, name):
+        return session().store[name]
+
+    def __contains__(self, name):
+        return name in session().store
+
+    def __setitem__(self, name, value):
+        session().store[name] = value
+
+    def __delitem__(self, name):
+        del session().store[name]
+
+    def __iter__(self):
+        return iter(session().store)
+
+    def __len__(self):
+        return len(session().store)
+
+    def update(self, *args, **kwargs):
+        session().store.update(*args, **kwargs)
+
+    def clear(self):
+        session().store.clear()
+
+class CurrentColors(Mapping):
+    """CL: the color table of the current session"""
+    def __getitem__(self, name):
+        return session().cl[name]
+
+    def __iter__(self):
+        return iter(session().cl)
+
+    def __len__(self):
+        return len(session().cl)
+
+STORE = CurrentStore()
+CL = CurrentColors()
+
+def __getattr__(name):
+    """OLD and ECHO of the current session, for code reading them from the module"""
+    if name in ('OLD', 'ECHO'):
+        return getattr(session(), name.lower())
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def ask(prompt="", var_type="auto"):
     """
     Get user input with type conversion and validation
@@ -102,8 +335,12 @@ def ask(prompt="", var_type="auto"):
     """
     
     try:
-        # Get input
-        user_input = input(prompt)
+        # Get input, from the parameters of a job if it has any left
+        if session().answers:
+            user_input = session().answers.pop(0)
+            print(f"{prompt}{user_input}")
+        else:
+            user_input = input(prompt)
         
         # Handle empty input
         if not user_input.strip():
@@ -133,32 +370,36 @@ def ask(prompt="", var_type="auto"):
         if var_type != "auto":
             print(f"Expected type: {var_type}")
                 
+def warn_builtin(name):
+    """
+    Warn when a variable takes the name of a built-in function, which the
+    variable does not replace. Constants are replaced silently, as always.
+    """
+    if callable(NAMESPACE.get(name)):
+        print(f"{CL['yellow']}Warning{CL['reset']}: {name} is a built-in function, "
+              f"use rs('{name}') to read the variable")
+
 def ss(k):
     """ Store last result to a variable """
-    global OLD,STORE,ECHO
-    STORE[k]=OLD
-    if ECHO:
-        print(f"{CL['white']}{k} {CL['yellow']}= {CL['green']}{OLD}")
-    return OLD
+    current = session()
+    warn_builtin(k)
+    current.store[k]=current.old
+    if current.echo:
+        print(f"{CL['white']}{k} {CL['yellow']}= {CL['green']}{current.old}")
+    return current.old
     
 def rs(k):
     """ restores value from stored position """
-    #global STORE, OLD
-    if k in STORE:
-        a = STORE[k]
-        return a
-    else:
-        return None
+    return STORE.get(k)
         
 def setvar(name,value):
-    global OLD,STORE,ECHO
-    STORE[str(name)]=str(value)
-    if ECHO:
+    warn_builtin(str(name))
+    STORE[str(name)]=value
+    if session().echo:
         print(f"{CL['white']}{name} {CL['yellow']}= {CL['green']}{value}")
     return value
         
 def show_all():
-    #global STORE
     """Display all stored values"""
     return '\n'.join(
         f"{var}: {val:.6g}" if isinstance(val, float) else f"{var}: {val}"
@@ -168,29 +409,48 @@ def show_all():
 
 def clearvars():
     """ clear all stored variables """
-    global STORE
     STORE.clear()
     print(f"{CL['bold']}{CL['yellow']}All variables cleared.{CL['reset']}")
 
+# one pass over all string functions; longest names first so that
+# decodebase64( is not taken for base64(. Compiled on first use.
+QUOTE_PATTERN = None
+
+def quote_pattern():
+    global QUOTE_PATTERN
+    if QUOTE_PATTERN is None:
+        QUOTE_PATTERN = re.compile(
+            r'(' + '|'.join(sorted(map(re.escape, set(STRING_FUNCTIONS)), key=len, reverse=True)) +
+            r')\(([^"\'()][^(),]*)\)')
+    return QUOTE_PATTERN
+
+def quote_argument(match):
+    func, arg = match.groups()
+    # Don't quote if it's already quoted or a number/variable
+    if (arg.replace('.','',1).isdigit() or
+            arg in COMMANDS or
+            any(op in arg for op in '+-*/%^')):
+        return match.group(0)
+    return f'{func}("{arg}")'
+
 def auto_quote(expr):
     """
     Automatically adds quotes to unquoted string arguments for specific functions
     """
-    # List of functions that expect string arguments
-    
-    
-    # Find all function calls in the expression
-    for func in STRING_FUNCTIONS:
-        pattern = re.compile(rf'{func}\(([^"\'][^),]*)\)')
-        matches = pattern.findall(expr)
-        for arg in matches:
-            # Don't quote if it's already quoted or a number/variable
-            if not (arg.startswith(('"', "'")) or 
-                    arg.replace('.','',1).isdigit() or
-                    arg in COMMANDS or
-                    any(op in arg for op in '+-*/%^()')):
-                expr = expr.replace(f'{func}({arg})', f'{func}("{arg}")')
-    return expr
+    if '(' not in expr:
+        return expr
+    return quote_pattern().sub(quote_argument, expr)
+
+def setup_readline():
+    """Load readline with history and tab completion, for interactive use only"""
+    import readline
+    readline.set_history_length(MAX_HISTORY)
+    readline.set_completer_delims(' \t\n')  # Don't break completion on these
+    readline.parse_and_bind("tab: complete")
+    readline.set_completer(completer)
+    for line in PENDING_HISTORY:
+        readline.add_history(line)
+    COMMANDS.extend(getfiles())
 
 def completer(text, state):
     """Auto-complete function for readline."""
@@ -208,83 +468,131 @@ DPI_PRESETS = {
 }
 
 # --- Unit Conversion Constants ---
-CONVERSIONS = {
-    # Length
-    'm': 1.0,
-    'km': 1000.0,
-    'cm': 0.01,
-    'mm': 0.001,
-    'mi': 1609.344,
-    'yd': 0.9144,
-    'ft': 0.3048,
-    'in': 0.0254,
-    
-    # Weight
-    'kg': 1.0,
-    'g': 0.001,
-    'mg': 0.000001,
-    'lb': 0.453592,
-    'oz': 0.0283495,
-    
-    # Temperature
-    'c': ('c', 'k', lambda x: x + 273.15, lambda x: x - 273.15),
-    'f': ('f', 'c', lambda x: (x - 32) * 5/9, lambda x: x * 9/5 + 32),
-    'k': ('k', 'c', lambda x: x - 273.15, lambda x: x + 273.15),
-    
-    # Time
-    'sec': 1.0,
-    'min': 60.0,
-    'hour': 3600.0,
-    'day': 86400.0,
-    
-    # Digital Storage
-    'b': 1.0,
-    'kb': 1024.0,
-    'mb': 1024**2,
-    'gb': 1024**3,
-    'tb': 1024**4,
+# Units indexed by dimension, with factors relative to the dimension's base
+# unit. Names are matched exactly, then data sizes case-insensitively (so
+# KB, MB, ... stay binary as they always were), then as SI/IEC prefix +
+# base unit, so Mm is a megametre and mm a millimetre.
+UNITS = {
+    'length': {
+        'm': 1.0, 'km': 1000.0, 'cm': 0.01, 'mm': 0.001,
+        'mi': 1609.344, 'yd': 0.9144, 'ft': 0.3048, 'in': 0.0254,
+    },
+    'mass': {
+        'kg': 1.0, 'g': 0.001, 'mg': 0.000001, 'lb': 0.453592, 'oz': 0.0283495,
+    },
+    'time': {
+        's': 1.0, 'sec': 1.0, 'min': 60.0, 'h': 3600.0, 'hr': 3600.0,
+        'hour': 3600.0, 'day': 86400.0,
+    },
+    'data': {
+        'b': 1.0, 'kb': 1024.0, 'mb': 1024**2, 'gb': 1024**3, 'tb': 1024**4,
+        'pb': 1024**5, 'bit': 0.125,
+    },
+}
+
+# Temperatures are affine: (to Celsius, from Celsius)
+TEMPERATURES = {
+    'c': (lambda x: x, lambda x: x),
+    'f': (lambda x: (x - 32) * 5/9, lambda x: x * 9/5 + 32),
+    'k': (lambda x: x - 273.15, lambda x: x + 273.15),
+}
+
+# Units that take a prefix, ex. nm, ms, Gg, KiB, Mbit
+PREFIXED_UNITS = {'m': 'length', 'g': 'mass', 's': 'time', 'B': 'data', 'bit': 'data'}
+
+SI_PREFIXES = {
+    'da': 10.0, 'h': 100.0, 'k': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12, 'P': 1e15,
+    'd': 0.1, 'c': 0.01, 'm': 1e-3, 'u': 1e-6, 'µ': 1e-6, 'n': 1e-9, 'p': 1e-12,
 }
+IEC_PREFIXES = {'Ki': 1024.0, 'Mi': 1024.0**2, 'Gi': 1024.0**3, 'Ti': 1024.0**4, 'Pi': 1024.0**5}
+
+# Shorthands for compound units
+UNIT_ALIASES = {'mph': 'mi/h', 'kph': 'km/h', 'kmh': 'km/h', 'bps': 'bit/s'}
+
+# unit name -> (dimension, factor), built from UNITS
+UNIT_INDEX = {unit: (((dimension, 1),), factor)
+              for dimension, units in UNITS.items() for unit, factor in units.items()}
+UNIT_INDEX['B'] = ((('data', 1),), 1.0)
+
+# (from unit, to unit) -> (factor, function), filled on first use
+CONVERSION_CACHE = {}
+
+CONVERSION_SPLIT = re.compile(r'\s+(?:to|in)\s+', re.IGNORECASE)
+CONVERSION_PATTERN = re.compile(
+    r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(\S+?)\s+(?:to|in)\s+(\S+)\s*$', re.IGNORECASE)
+UNIT_PART = re.compile(r'^(.+?)(?:\^?(\d))?$')
+
+# {name} or {name.method} references in formatvars templates
+FORMAT_FIELD = re.compile(r'\{([^}]+)\}')
+# how many times a value that itself holds {references} is expanded
+MAX_FORMAT_DEPTH = 8
+
+def parse_template(template):
+    """
+    Split a template into literal strings and (field, name, method) tuples.
+    Parsed templates are cached in FORMAT_CACHE as [segments, (version, result)].
+    """
+    entry = FORMAT_CACHE.get(template)
+    if entry is None:
+        segments = []
+        pos = 0
+        for match in FORMAT_FIELD.finditer(template):
+            if match.start() > pos:
+                segments.append(template[pos:match.start()])
+            name, _, method = match.group(1).partition('.')
+            segments.append((match.group(0), name, method))
+            pos = match.end()
+        if pos < len(template):
+            segments.append(template[pos:])
+        entry = [tuple(segments), (None, None)]
+        FORMAT_CACHE.put(template, entry)
+    return entry
+
+def expand_template(segments, depth):
+    """Join the segments of a parsed template with values from STORE"""
+    parts = []
+    for segment in segments:
+        if segment.__class__ is str:
+            parts.append(segment)
+            continue
+        field, name, method = segment
+        if name not in STORE:
+            parts.append(field)  # keep the original if variable not found
+            continue
+        value = STORE[name]
+        if method:
+            try:
+                value = getattr(value, method)()
+            except AttributeError:
+                parts.append(field)  # keep the original if operation fails
+                continue
+        value = str(value)
+        # values may reference other variables
+        if depth > 1 and '{' in value:
+            value = expand_template(parse_template(value)[0], depth - 1)
+        parts.append(value)
+    return ''.join(parts)
 
 def formatvars(template):
     """
     Replace {variables} in a string with values from STORE dictionary.
     Supports nested expressions and maintains original formatting when variables don't exist.
+    Results are cached until STORE changes; anything but a string is returned as is.
     """
-    global STORE, CL
-    
-    def replace_match(match):
-        var_name = match.group(1)
-        
-        # Handle nested expressions (like {var.upper()})
-        if '.' in var_name:
-            base_var, _, operation = var_name.partition('.')
-            if base_var in STORE:
-                try:
-                    value = getattr(STORE[base_var], operation)()
-                    return str(value)
-                except AttributeError:
-                    return match.group(0)  # Return original if operation fails
-            return match.group(0)
-        
-        # Simple variable replacement
-        if var_name in STORE:
-            return str(STORE[var_name])
-        return match.group(0)  # Return original if variable not found
-    
+    if not isinstance(template, str):
+        return template
+    if '{' not in template:
+        return template
+    entry = parse_template(template)
+    version = STORE.version
+    if entry[1][0] == version:
+        return entry[1][1]
     try:
-        # First pass: Replace direct variable references
-        result = re.sub(r'\{([^}]+)\}', replace_match, template)
-        
-        # Second pass: Handle any expressions that might reference STORE vars
-        while True:
-            new_result = re.sub(r'\{([^}]+)\}', replace_match, result)
-            if new_result == result:  # No more replacements possible
-                break
-            result = new_result
-            
-        return result
+        result = expand_template(entry[0], MAX_FORMAT_DEPTH)
     except Exception as e:
         return f"{CL['red']}Format error: {str(e)}{CL['reset']}"
+    entry[1] = (version, result)
+    return result
 
 def pline(cmd,text,pad=6):
     print(f"{' '*pad}{CL['bold']}{CL['white']}{cmd.strip().ljust(25)} {CL['cyan']}: {CL['reset']}{CL['white']}{text.strip().ljust(40)}")
@@ -317,11 +625,15 @@ def showhelp(cat):
         pline('    Length',' m, km, cm, mm, mi, yd, ft, in')
         pline('    Weight',' kg, g, mg, lb, oz')
         pline('    Temperature',' C, F, K')
-        pline('    Time',' s, min, hr, day')
-        pline('    Digital',' b, kb, mb, gb, tb')
-        print('')    
+        pline('    Time',' s, min, h, hr, day')
+        pline('    Digital',' b, kb, mb, gb, tb, pb (1024 based), bit')
+        pline('    Prefixes',' SI on m, g, s, B, bit ex. nm, ms, Mbit')
+        pline('','IEC on B, bit ex. KiB, GiB')
+        pline('    Compound',' km/h, MB/s, m^2, mph, kph')
+        print('')
         title('    Examples:')
         print('    10kg in lb, 100c to f, 0k to c, 1mb to kb, 1day to hour')
+        print('    100km/h to mph, 1GiB to MB, 50Mbit/s to MB/s')
     elif cat == 'operation':
         title('  Supported Operations:')
         pline('           +,-,*,/ ',' add, subtrack, multiply, devide (float)')
@@ -348,6 +660,9 @@ def showhelp(cat):
         pline('        addpercent ',' adds the percentage value to number')
         pline('        subpercent ',' subtracts the percentage value to number')
         pline('             prime ',' returns 0/1 if number is prime')
+        pline('            factor ',' prime factors of a number')
+        pline('         nextprime ',' smallest prime greater than number')
+        pline('      primes(a, b) ',' list of primes from a to b')
     elif cat == 'command':
         title('  Commands:')
         pline('cl,clear,cls ',' clear screen')
@@ -357,6 +672,8 @@ def showhelp(cat):
         pline('var ',' show all stored variables')
         pline('ls,list ','list .calc files in current dir.')
         pline('             reset ',' clear all stored variables')
+        pline('cache [size|clear]','show/resize/clear the expression cache')
+        pline('mode [float|decimal [digits]|fraction]','numeric mode of calculations')
         pline('file(filename)','execute given file')
         pline('print(string),write','output given string')
         pline('pause','wait for enter, only for use in files')
@@ -379,8 +696,10 @@ def showhelp(cat):
         pline('dayofyear(''yyyy-mm-dd'')','returns number of days of the year')
         pline('weeknumber(''yyyy-mm-dd'')','returns number of week')
         pline('weekend(''yyyy-mm-dd'')','return 0/1 if date is on weekend')
-        pline('date2unix(''yyyy-mm-dd'')',' convert date string to UNIX timestamp')
-        pline('unix2date(timestamp)',' convert UNIX time to readable date')
+        pline('businessdays(date1,date2)','Monday to Friday days between two dates')
+        pline('weekends(date1,date2)','Saturdays and Sundays between two dates')
+        pline('date2unix(''yyyy-mm-dd'',utc)',' convert date string to UNIX timestamp, utc=1 for UTC')
+        pline('unix2date(timestamp,fmt,utc)',' convert UNIX time to readable date')
         pline('unix2gregorian(timestamp)',' get Gregorian calendar components')
         pline('unix2julian(timestamp)',' convert to Julian Date')
         title('  Examples:')
@@ -394,11 +713,14 @@ def showhelp(cat):
         title('    Functions:')
         pline('crc32(string),md5,sha256 ',' return hash number of string')
         pline('                   . ',' ex. crc32("hello")')
+        pline('hash(string,algo)',' hash with any algorithm, ex. hash("hello","sha1")')
+        pline('hashfile(path,algo)',' hash of a file, algo defaults to sha256')
         pline('shr(num,times),shl ',' shift bitwise left or right')
         pline('                   . ',' ex. shl(4, 2)')
         pline('repeat(char,n) ',' repeat char/string n times')
         pline('len(string) ',' returns length of string')
         pline('hex2rgb(#FFFFFF) ',' hex to RGB value')
+        pline('palette(path,conv)',' convert all colors of a file, ex. palette("img.ppm","rgb2hex")')
         pline('base64(string)',' encode string to base64')
         pline('decodebase64(string)',' decode string to base64')
         pline('rgb2hex(byte,byte,byte) ',' RGB to HEX value')
@@ -534,25 +856,36 @@ def listfiles():
 
 # calendar functions
 
-def date_to_unix(date_str):
+def date_to_unix(date_str, utc=0):
     """
-    Convert date string (YYYY-MM-DD [HH:MM:SS]) to UNIX timestamp
-    Usage: date_to_unix("2023-01-01") or date_to_unix("2023-01-01 12:00:00")
+    Convert date string (YYYY-MM-DD [HH:MM:SS]) to UNIX timestamp, in local
+    time or with utc=1 in UTC
+    Usage: date_to_unix("2023-01-01") or date_to_unix("2023-01-01 12:00:00", 1)
     """
     try:
-        date_str = formatvars(date_str)
-        dt = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+        date_str = str(formatvars(date_str)).strip()
+        if len(date_str) > 10:
+            dt = datetime.datetime.fromisoformat(date_str)
+        else:
+            dt = datetime.datetime.combine(parse_date(date_str), datetime.time())
+        if utc:
+            import calendar
+            return calendar.timegm(dt.timetuple())
         return int(time.mktime(dt.timetuple()))
     except ValueError as e:
         return f"{CL['red']}Invalid date format. Use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS{CL['reset']}"
 
-def unix_to_date(timestamp, format_str="%Y-%m-%d"):
+def unix_to_date(timestamp, format_str="%Y-%m-%d", utc=0):
     """
-    Convert UNIX timestamp to formatted date string
+    Convert UNIX timestamp to formatted date string, in local time or with utc=1 in UTC
     Usage: unix_to_date(1672531200) or unix_to_date(1672531200, "%Y-%m-%d")
     """
     try:
-        return datetime.datetime.fromtimestamp(int(timestamp)).strftime(format_str)
+        if utc:
+            dt = datetime.datetime.fromtimestamp(int(timestamp), datetime.timezone.utc)
+        else:
+            dt = datetime.datetime.fromtimestamp(int(timestamp))
+        return dt.strftime(format_str)
     except (ValueError, TypeError) as e:
         return f"{CL['red']}Invalid timestamp{CL['reset']}"
 
@@ -580,55 +913,307 @@ def unix_to_julian(timestamp):
     except (ValueError, TypeError) as e:
         return f"{CL['red']}Invalid timestamp{CL['reset']}"
 
+def parse_date(date_str):
+    """
+    datetime.date of a YYYY-MM-DD string, cached in DATE_CACHE. ISO dates
+    go through date.fromisoformat; unpadded ones like 2025-5-4 are split.
+    """
+    if isinstance(date_str, datetime.date):
+        return date_str
+    date_str = str(date_str).strip()
+    date = DATE_CACHE.get(date_str)
+    if date is None:
+        try:
+            date = datetime.date.fromisoformat(date_str)
+        except ValueError:
+            try:
+                year, month, day = map(int, date_str.split('-'))
+                date = datetime.date(year, month, day)
+            except ValueError:
+                raise ValueError(f"{CL['red']}Invalid date{CL['reset']}: {date_str} (use YYYY-MM-DD)")
+        DATE_CACHE.put(date_str, date)
+    return date
+
 def days_between(date1, date2):
     """Calculate number of days between two dates (YYYY-MM-DD)"""
-    date1 = formatvars(date1)
-    date2 = formatvars(date2)
-    d1 = datetime.datetime.strptime(date1, "%Y-%m-%d")
-    d2 = datetime.datetime.strptime(date2, "%Y-%m-%d")
+    d1 = parse_date(formatvars(date1))
+    d2 = parse_date(formatvars(date2))
     return abs((d2 - d1).days)
     
 def add_days(date_str, days):
     """Add days to a date (YYYY-MM-DD)"""
-    date_str = formatvars(date_str)
-    date = datetime.datetime.strptime(str(date_str), "%Y-%m-%d")
+    date = parse_date(formatvars(date_str))
     new_date = date + datetime.timedelta(days=days)
-    return new_date.strftime("%Y-%m-%d")
+    return new_date.isoformat()
     
 def day_of_year(date_str):
-    date_str = formatvars(date_str)
     """Return day of year (1-366) for a date (YYYY-MM-DD)"""
-    date = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+    date = parse_date(formatvars(date_str))
     return date.timetuple().tm_yday
 
 def week_number(date_str):
     """Return ISO week number for a date (YYYY-MM-DD)"""
-    date_str = formatvars(date_str)
-    date = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+    date = parse_date(formatvars(date_str))
     return date.isocalendar()[1]
     
 def is_weekend(date_str):
     """Check if date falls on a weekend (YYYY-MM-DD)"""
-    date_str = formatvars(date_str)
-    date = datetime.datetime.strptime(date_str, "%Y-%m-%d")
+    date = parse_date(formatvars(date_str))
     return int(date.weekday() >= 5)  # 5=Saturday, 6=Sunday    
 
 def is_leap(year):
     """Check leap year"""
+    import calendar
     year = formatvars(year)
     return int(calendar.isleap(year))
 
 def weekday_name(date_str):
     """Get weekday name for date (YYYY-MM-DD)"""
-    date_str = formatvars(date_str)
-    year, month, day = map(int, date_str.split('-'))
-    return str(calendar.day_name[calendar.weekday(year, month, day)])
+    import calendar
+    date = parse_date(formatvars(date_str))
+    return str(calendar.day_name[date.weekday()])
     
 def monthdays(date_str):
-    date_str = formatvars(date_str)
-    year, month, day = map(int, date_str.split("-"))
-    return calendar.monthrange(year, month)[1]
-    
+    import calendar
+    date = parse_date(formatvars(date_str))
+    return calendar.monthrange(date.year, date.month)[1]
+
+# bulk date functions, streaming dates instead of building lists
+
+def iter_dates(start, stop, step=1):
+    """Dates from start to stop, stop included"""
+    if step <= 0:
+        raise ValueError(f"{CL['red']}Step must be a positive number of days{CL['reset']}: {step}")
+    date = parse_date(start)
+    stop = parse_date(stop)
+    step = datetime.timedelta(days=step)
+    while date <= stop:
+        yield date
+        try:
+            date += step
+        except OverflowError:
+            # past 9999-12-31
+            return
+
+def iter_weekends(start, stop):
+    """Saturdays and Sundays from start to stop, stop included"""
+    start, stop = parse_date(start), parse_date(stop)
+    # the Saturday of start's week, then step a week at a time; day
+    # ordinals can go past 9999-12-31 where dates cannot
+    first, last = start.toordinal(), stop.toordinal()
+    saturday = first + 5 - start.weekday()
+    while saturday - 1 <= last:
+        for day in (saturday, saturday + 1):
+            if first <= day <= last:
+                yield datetime.date.fromordinal(day)
+        saturday += 7
+
+def iter_business_days(start, stop):
+    """Monday to Friday dates from start to stop, stop included"""
+    return (date for date in iter_dates(start, stop) if date.weekday() < 5)
+
+def business_days(date1, date2):
+    """Number of Monday to Friday days from the earlier date up to the later one, not counting it"""
+    d1, d2 = sorted((parse_date(formatvars(date1)), parse_date(formatvars(date2))))
+    weeks, rest = divmod((d2 - d1).days, 7)
+    first = d1.weekday()
+    return weeks * 5 + sum((first + i) % 7 < 5 for i in range(rest))
+
+def weekends(date1, date2):
+    """Number of Saturdays and Sundays from the earlier date up to the later one, not counting it"""
+    d1, d2 = sorted((parse_date(formatvars(date1)), parse_date(formatvars(date2))))
+    return (d2 - d1).days - business_days(d1, d2)
+
+# --dates series, listing dates or 'date,value' lines for every day
+DATE_ITERATORS = {
+    'days': iter_dates,
+    'weekends': iter_weekends,
+    'businessdays': iter_business_days,
+}
+DATE_FUNCTIONS = {
+    'weekday': weekday_name,
+    'dayofyear': day_of_year,
+    'weeknumber': week_number,
+    'weekend': is_weekend,
+    'monthdays': monthdays,
+}
+
+def date_series(series, range_spec, chunk_size=BATCH_CHUNK):
+    """Yield lists of output lines of a series over a date range 'START..STOP[:STEP]'"""
+    bounds, _, step = range_spec.partition(':')
+    start, sep, stop = bounds.partition('..')
+    if not sep:
+        raise ValueError("Use format 'start..stop' or 'start..stop:step'")
+    if step and series in ('weekends', 'businessdays'):
+        raise ValueError(f"{CL['red']}A step cannot be used with{CL['reset']}: {series}")
+    try:
+        step = int(step or 1)
+    except ValueError:
+        raise ValueError(f"{CL['red']}Step must be a whole number of days{CL['reset']}: {step}")
+    if step <= 0:
+        raise ValueError(f"{CL['red']}Step must be a positive number of days{CL['reset']}: {step}")
+    if series in DATE_ITERATORS:
+        iterator = DATE_ITERATORS[series]
+        dates = iterator(start, stop, step) if iterator is iter_dates else iterator(start, stop)
+        lines = map(datetime.date.isoformat, dates)
+    elif series in DATE_FUNCTIONS:
+        function = DATE_FUNCTIONS[series]
+        lines = (f'{date},{function(date)}' for date in iter_dates(start, stop, step))
+    else:
+        raise ValueError(f"{CL['red']}Unknown date series{CL['reset']}: {series} "
+                         f"(use {', '.join(list(DATE_ITERATORS) + list(DATE_FUNCTIONS))})")
+    while True:
+        chunk = list(itertools.islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+# batch timestamp conversion. UTC conversions work on day numbers, with
+# civil_from_days in Python or datetime64 arrays with NumPy; local time
+# needs the time zone rules, so it goes through datetime per row.
+TIMESTAMP_MODES = ('date', 'datetime', 'gregorian', 'julian')
+
+def civil_from_days(days):
+    """(year, month, day) of a number of days since 1970-01-01, proleptic Gregorian"""
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + 3 if mp < 10 else mp - 9
+    return yoe + era * 400 + (month <= 2), month, day
+
+# seconds of 0001-01-01T00:00:00 and 9999-12-31T23:59:59 UTC, the dates
+# unix2date can print
+TIMESTAMP_RANGE = (-62135596800, 253402300799)
+
+def parse_timestamps(fields):
+    """Ints of timestamp fields, fractional ones truncated like int() in unix2date"""
+    try:
+        return list(map(int, fields))
+    except ValueError:
+        return [int(float(field)) for field in fields]
+
+def timestamp_array(fields, numpy):
+    """int64 array of timestamp fields, truncated like parse_timestamps"""
+    try:
+        return numpy.array(fields, dtype=numpy.int64)
+    except (ValueError, OverflowError):
+        values = numpy.trunc(numpy.array(fields, dtype=float))
+        # nan, inf, past int64 or so close to it that adding a day wraps around
+        if not numpy.all(numpy.abs(values) < 2.0 ** 62):
+            raise ValueError('timestamp out of range')
+        return values.astype(numpy.int64)
+
+def check_timestamp_range(low, high):
+    """Reject timestamps outside of the years 1 to 9999"""
+    if low < TIMESTAMP_RANGE[0] or high > TIMESTAMP_RANGE[1]:
+        raise ValueError('timestamp out of range')
+
+def day_label(mode, day):
+    """Date text of a day number for a date or gregorian conversion"""
+    y, m, d = civil_from_days(day)
+    return f'{y},{m},{d}' if mode == 'gregorian' else f'{y:04d}-{m:02d}-{d:02d}'
+
+def timestamp_lines(mode, fields, utc=False, numpy=None):
+    """Convert a chunk of timestamp fields to output lines"""
+    if mode == 'julian':
+        # same convention as unix2julian, printed with 6 fixed decimals
+        days = None
+        if numpy is not None:
+            try:
+                seconds = timestamp_array(fields, numpy)
+            except ValueError:
+                seconds = None  # not a number or past int64, see below
+            if seconds is not None and (not len(seconds) or numpy.abs(seconds).max() < 2 ** 62):
+                days = ((seconds + 43200) / 86400.0 + 2440587.5).tolist()
+        if days is None:
+            days = [(t + 43200) / 86400.0 + 2440587.5 for t in parse_timestamps(fields)]
+        if not all(map(math.isfinite, days)):
+            raise ValueError('timestamp out of range')
+        return ['%.6f' % day for day in days]
+    if not utc:
+        lines = []
+        for t in parse_timestamps(fields):
+            dt = datetime.datetime.fromtimestamp(t)
+            if mode == 'date':
+                lines.append(dt.strftime('%Y-%m-%d'))
+            elif mode == 'datetime':
+                lines.append(dt.strftime('%Y-%m-%dT%H:%M:%S'))
+            else:
+                lines.append(f'{dt.year},{dt.month},{dt.day}')
+        return lines
+    if numpy is not None:
+        seconds = timestamp_array(fields, numpy)
+        if len(seconds):
+            check_timestamp_range(seconds.min(), seconds.max())
+        if mode == 'datetime':
+            return numpy.datetime_as_string(seconds.astype('datetime64[s]'), unit='s').tolist()
+        # label each distinct day once, then spread the labels over the rows
+        days, index = numpy.unique(seconds // 86400, return_inverse=True)
+        labels = numpy.array([day_label(mode, day) for day in days.tolist()], dtype=object)
+        return labels[index].tolist()
+    # logs have many rows per day, so each day is converted once
+    labels = {}
+    lines = []
+    for t in parse_timestamps(fields):
+        check_timestamp_range(t, t)
+        day, seconds = divmod(t, 86400)
+        label = labels.get(day)
+        if label is None:
+            label = labels[day] = day_label(mode, day)
+        if mode == 'datetime':
+            lines.append(f'{label}T{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}')
+        else:
+            lines.append(label)
+    return lines
+
+def convert_timestamps(mode, stream, utc=False, chunk_size=BATCH_CHUNK):
+    """
+    Yield lists of converted timestamps from the first column of a stream,
+    chunk_size lines at a time. int() and float() take the surrounding
+    whitespace, so fields are only cleaned up for chunks with blank or
+    comment lines, and converted row by row, with an error line for each
+    bad row, for chunks that still fail.
+    """
+    if mode not in TIMESTAMP_MODES:
+        raise ValueError(f"{CL['red']}Unknown timestamp conversion{CL['reset']}: {mode} (use {', '.join(TIMESTAMP_MODES)})")
+    numpy = load_numpy()
+    while True:
+        lines = list(itertools.islice(stream, chunk_size))
+        if not lines:
+            return
+        fields = [line.partition(',')[0] for line in lines]
+        try:
+            yield timestamp_lines(mode, fields, utc, numpy)
+        except (ValueError, OverflowError, OSError):
+            fields = list(iter_fields(lines))
+        else:
+            continue
+        if not fields:
+            continue
+        try:
+            yield timestamp_lines(mode, fields, utc, numpy)
+        except (ValueError, OverflowError, OSError):
+            results = []
+            for field in fields:
+                try:
+                    results.extend(timestamp_lines(mode, [field], utc, numpy))
+                except (ValueError, OverflowError, OSError):
+                    results.append(f"{CL['red']}Error{CL['reset']}: not a timestamp: {field}")
+            yield results
+
+def run_timestamps(mode, path='-', utc=False, chunk_size=BATCH_CHUNK, verbose=False):
+    """Stream converted timestamps from the first column of a file or stdin to stdout"""
+    stream = open_input(path)
+    try:
+        write_chunks(convert_timestamps(mode, stream, utc, chunk_size), verbose)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
 def cal(year=None, month=None):
     """
     Display a formatted month calendar.
@@ -644,6 +1229,7 @@ def cal(year=None, month=None):
         >>> print(cal(2023, 8))
         >>> print(cal())  # Current month
     """
+    import calendar
     month = int(formatvars(month))
     year = int(formatvars(year))
     
@@ -685,52 +1271,95 @@ def roman(num):
         num -= val[i] * count
     return roman
     
+def simple_unit(name):
+    """Resolve a single unit name with optional prefix to (dimension, factor)"""
+    if name in UNIT_INDEX:
+        return UNIT_INDEX[name]
+    if name.lower() in UNITS['data']:
+        return UNIT_INDEX[name.lower()]
+    for prefixes in (IEC_PREFIXES, SI_PREFIXES):
+        for prefix, scale in prefixes.items():
+            base = name[len(prefix):]
+            if name.startswith(prefix) and base in PREFIXED_UNITS:
+                if prefixes is IEC_PREFIXES and PREFIXED_UNITS[base] != 'data':
+                    continue
+                dimension, factor = UNIT_INDEX[base] if base in UNIT_INDEX else UNIT_INDEX[base.lower()]
+                return dimension, scale * factor
+    raise ValueError(f"{CL['red']}Unknown unit{CL['reset']}: {name}")
+
+def resolve_unit(name):
+    """
+    Resolve a unit to (dimension, numerator factor, denominator factor).
+    Compound units combine simple ones with / and *, and may carry a power,
+    ex. km/h, MB/s, m^2, kg*m/s2. The dimension is a tuple of
+    (base dimension, exponent) pairs.
+    """
+    name = UNIT_ALIASES.get(name.lower(), name)
+    if '/' not in name and '*' not in name and not name[-1:].isdigit():
+        return simple_unit(name) + (1.0,)
+    exponents = {}
+    factors = [1.0, 1.0]
+    numerator, _, denominator = name.partition('/')
+    for parts, sign in ((numerator, 1), (denominator, -1)):
+        for part in filter(None, parts.split('*')):
+            unit, power = UNIT_PART.match(part).groups()
+            power = int(power or 1)
+            dimension, scale = simple_unit(unit)
+            factors[sign < 0] *= scale ** power
+            for base, exponent in dimension:
+                exponents[base] = exponents.get(base, 0) + sign * exponent * power
+    return (tuple(sorted((b, e) for b, e in exponents.items() if e)),) + tuple(factors)
+
+def describe_dimension(dimension):
+    """Readable dimension, ex. length/time"""
+    up = '*'.join(b if e == 1 else f'{b}^{e}' for b, e in dimension if e > 0) or '1'
+    down = '*'.join(b if e == -1 else f'{b}^{-e}' for b, e in dimension if e < 0)
+    return f'{up}/{down}' if down else up
+
+def conversion(from_unit, to_unit):
+    """
+    Return (factor, function) converting from_unit to to_unit, memoized.
+    Linear units give a factor and no function; temperatures give a function.
+    """
+    key = (from_unit, to_unit)
+    if key in CONVERSION_CACHE:
+        return CONVERSION_CACHE[key]
+
+    # Temperature conversion through Celsius
+    if from_unit.lower() in TEMPERATURES or to_unit.lower() in TEMPERATURES:
+        if from_unit.lower() not in TEMPERATURES or to_unit.lower() not in TEMPERATURES:
+            raise ValueError(f"{CL['red']}Unsupported unit conversion{CL['reset']}: {from_unit} to {to_unit}")
+        to_celsius = TEMPERATURES[from_unit.lower()][0]
+        from_celsius = TEMPERATURES[to_unit.lower()][1]
+        result = (None, lambda x: from_celsius(to_celsius(x)))
+    else:
+        from_dimension, from_up, from_down = resolve_unit(from_unit)
+        to_dimension, to_up, to_down = resolve_unit(to_unit)
+        if from_dimension != to_dimension:
+            raise ValueError(f"{CL['red']}Incompatible units{CL['reset']}: "
+                             f"{from_unit} ({describe_dimension(from_dimension)}) to "
+                             f"{to_unit} ({describe_dimension(to_dimension)})")
+        result = ((from_up * to_down) / (from_down * to_up), None)
+    CONVERSION_CACHE[key] = result
+    return result
+
 def convert(value, from_unit, to_unit):
     """Handle unit conversions including temperature."""
-    from_unit = from_unit.lower()
-    to_unit = to_unit.lower()
-    
-    # Temperature conversion
-    if from_unit in ('c', 'f', 'k') and to_unit in ('c', 'f', 'k'):
-        if from_unit == to_unit:
-            return value
-        
-        # Convert to Celsius first if needed
-        if from_unit != 'c':
-            temp_info = CONVERSIONS[from_unit]
-            value = temp_info[2](value)
-        
-        # Convert from Celsius to target
-        if to_unit != 'c':
-            temp_info = CONVERSIONS[to_unit]
-            value = temp_info[3](value)
-        
-        return value
-    
-    # Regular conversion
-    try:
-        return value * (CONVERSIONS[from_unit] / CONVERSIONS[to_unit])
-    except KeyError:
-        raise ValueError(f"{CL['red']}Unsupported unit conversion{CL['reset']}: {from_unit} to {to_unit}")
+    factor, function = conversion(from_unit, to_unit)
+    if function is None:
+        return value * factor
+    return function(value)
 
 def parse_conversion(expr):
     """Parse conversion expressions like '5km to mi'."""
-    parts = re.split(r'\s+(?:to|in)\s+', expr, flags=re.IGNORECASE)
-    if len(parts) != 2:
-        raise ValueError("Use format '5km to mi' or '5km in mi'")
-    
-    # Extract value and from unit
-    value_part = parts[0]
-    match = re.match(r'([-+]?\d*\.?\d+)\s*([a-zA-Z]+)', value_part)
+    match = CONVERSION_PATTERN.match(expr)
     if not match:
-        raise ValueError("{CL['red']}Could not parse value and unit{CL['reset']}")
-    
-    value = float(match.group(1))
-    from_unit = match.group(2).lower()
-    to_unit = parts[1].lower()
-    
-    return convert(value, from_unit, to_unit)
-    
+        if len(CONVERSION_SPLIT.split(expr)) != 2:
+            raise ValueError("Use format '5km to mi' or '5km in mi'")
+        raise ValueError(f"{CL['red']}Could not parse value and unit{CL['reset']}")
+    value, from_unit, to_unit = match.groups()
+    return convert(float(value), from_unit, to_unit)
+
 # frequency functions
 
 def wavelength(freq_input):
@@ -791,15 +1420,153 @@ def show_dpi_presets():
 
 # math functions
 
+SMALL_PRIME_LIMIT = 1 << 16
+SMALL_PRIMES = None   # primes below SMALL_PRIME_LIMIT
+SMALL_SIEVE = None    # 1/0 flags for numbers below SMALL_PRIME_LIMIT
+# (limit, bases): Miller-Rabin with these bases is deterministic below limit
+PRIME_BASES = (
+    (3215031751, (2, 3, 5, 7)),
+    (1 << 64, (2, 325, 9375, 28178, 450775, 9780504, 1795265022)),
+    (3317044064679887385961981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+)
+
+def sieve(limit):
+    """Return 1/0 prime flags for the numbers below limit"""
+    flags = bytearray([1]) * max(limit, 2)
+    flags[0] = flags[1] = 0
+    for i in range(2, math.isqrt(limit - 1) + 1 if limit > 1 else 0):
+        if flags[i]:
+            flags[i*i::i] = bytes(len(range(i*i, limit, i)))
+    return flags
+
+def small_primes():
+    """Primes below SMALL_PRIME_LIMIT, sieved once on first use"""
+    global SMALL_PRIMES, SMALL_SIEVE
+    if SMALL_PRIMES is None:
+        SMALL_SIEVE = sieve(SMALL_PRIME_LIMIT)
+        SMALL_PRIMES = list(itertools.compress(range(SMALL_PRIME_LIMIT), SMALL_SIEVE))
+    return SMALL_PRIMES
+
+def strong_probable_prime(n, a):
+    """Miller-Rabin round: True if n is a strong probable prime to base a"""
+    a %= n
+    if a == 0:
+        return True
+    d = n - 1
+    s = 0
+    while not d & 1:
+        d >>= 1
+        s += 1
+    x = pow(a, d, n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(s - 1):
+        x = x * x % n
+        if x == n - 1:
+            return True
+    return False
+
 def is_prime(n):
     """Check if a number is prime."""
-    if n < 2: return 0
-    if n == 2: return 1
-    if n % 2 == 0: return 0
-    for i in range(3, int(n**0.5)+1, 2):
-        if n % i == 0:
+    n = int(n)
+    if n < SMALL_PRIME_LIMIT:
+        small_primes()
+        return SMALL_SIEVE[n] if n >= 0 else 0
+    # quick rejection by the first primes
+    for p in small_primes()[:60]:
+        if n % p == 0:
             return 0
-    return 1
+    for limit, bases in PRIME_BASES:
+        if n < limit:
+            return int(all(strong_probable_prime(n, a) for a in bases))
+    # beyond the deterministic range: strong probable prime to the
+    # largest fixed set of bases and to extra random bases
+    import random
+    bases = PRIME_BASES[-1][1] + tuple(random.randrange(2, n - 1) for _ in range(16))
+    return int(all(strong_probable_prime(n, a) for a in bases))
+
+def pollard_rho(n):
+    """Find a nontrivial factor of a composite n (Brent's variant)"""
+    import random
+    if n % 2 == 0:
+        return 2
+    while True:
+        y, c, m = random.randrange(1, n), random.randrange(1, n), 128
+        g = r = q = 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+def factor(n):
+    """Prime factors of n with multiplicity, ex. factor(360) = [2, 2, 2, 3, 3, 5]"""
+    n = int(n)
+    factors = [-1] if n < 0 else []
+    n = abs(n)
+    if n < 2:
+        return factors
+    for p in small_primes():
+        if p * p > n:
+            break
+        while n % p == 0:
+            factors.append(p)
+            n //= p
+    pending = [n] if n > 1 else []
+    while pending:
+        m = pending.pop()
+        if is_prime(m):
+            factors.append(m)
+        else:
+            d = pollard_rho(m)
+            pending.extend((d, m // d))
+    return sorted(factors)
+
+def nextprime(n):
+    """Smallest prime greater than n"""
+    n = int(n) + 1
+    if n <= 2:
+        return 2
+    n |= 1
+    while not is_prime(n):
+        n += 2
+    return n
+
+def iter_primes(start, stop, segment=SMALL_PRIME_LIMIT):
+    """Yield the primes in [start, stop] with a segmented sieve"""
+    start, stop = max(int(start), 2), int(stop)
+    if stop < start:
+        return
+    base = sieve(math.isqrt(stop) + 1)
+    base = list(itertools.compress(range(len(base)), base))
+    for low in range(start, stop + 1, segment):
+        high = min(low + segment, stop + 1)
+        flags = bytearray([1]) * (high - low)
+        for p in base:
+            if p * p >= high:
+                break
+            first = max(p * p, (low + p - 1) // p * p)
+            flags[first - low::p] = bytes(len(range(first, high, p)))
+        yield from itertools.compress(range(low, high), flags)
+
+def primes(start, stop):
+    """List of the primes in [start, stop]"""
+    return list(iter_primes(start, stop))
     
 def curt(data):
     """Cubic root of number"""
@@ -819,6 +1586,7 @@ def random_int(max_num):
         >>> random_int(10)  # Possible output: 7
         >>> random_int(100) # Possible output: 42
     """
+    import random
     if not isinstance(max_num, int) or max_num < 1:
         raise ValueError(f"{CL['red']}max_num must be a positive integer{CL['reset']}")
     
@@ -826,13 +1594,15 @@ def random_int(max_num):
     
 def addpercent(val,p):
     try:
-        return f'= {val + (val * p / 100)} perc: {val * p / 100}'
+        perc = divide(val * p, 100)
+        return f'= {val + perc} perc: {perc}'
     except:
         return -1
 
 def subpercent(val,p):
     try:
-        return f'= {val - (val * p / 100)} perc: {val * p / 100}'
+        perc = divide(val * p, 100)
+        return f'= {val - perc} perc: {perc}'
     except:
         return -1
 
@@ -852,29 +1622,250 @@ def repeat(s, n):
     return s * n
     
 # hash functions
+HASH_CHUNK = 1 << 20
+
+class Checksum:
+    """zlib.crc32 / zlib.adler32 behind the hashlib update/hexdigest interface"""
+    def __init__(self, name):
+        import zlib
+        self.name = name
+        self.function = getattr(zlib, name)
+        self.value = 0 if name == 'crc32' else 1
+        self.digest_size = 4
+
+    def update(self, data):
+        self.value = self.function(data, self.value)
+
+    def hexdigest(self):
+        return f'{self.value & 0xffffffff:08x}'
+
+def hash_algorithms():
+    """Names accepted by new_hash"""
+    import hashlib
+    return sorted(hashlib.algorithms_available | {'crc32', 'adler32'})
+
+def new_hash(algorithm):
+    """A hashlib object, or a Checksum for crc32/adler32"""
+    import hashlib
+    name = algorithm.lower()
+    if name in ('crc32', 'adler32'):
+        return Checksum(name)
+    try:
+        return hashlib.new(name)
+    except (ValueError, TypeError):
+        raise ValueError(f"{CL['red']}Unknown hash algorithm{CL['reset']}: {algorithm} "
+                         f"(use {', '.join(hash_algorithms())})")
+
+def hexdigest(h):
+    """Hex digest, with 256 bits for the variable length shake algorithms"""
+    return h.hexdigest() if h.digest_size else h.hexdigest(32)
+
+def hash_stream(h, stream):
+    """Feed a binary stream to h in HASH_CHUNK reads into one reused buffer"""
+    buffer = bytearray(HASH_CHUNK)
+    view = memoryview(buffer)
+    size = 0
+    while True:
+        n = stream.readinto(buffer)
+        if not n:
+            return size
+        h.update(view[:n])
+        size += n
+
+def hash_path(algorithm, path):
+    """
+    Hash a file, or stdin for '-'. Regular files are mapped with mmap and
+    handed to the hash in one call, so there is no copy in Python and
+    hashlib can release the GIL for the whole file. Returns (hex, size).
+    """
+    h = new_hash(algorithm)
+    if path == '-':
+        size = hash_stream(h, sys.stdin.buffer)
+        return hexdigest(h), size
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # empty files cannot be mapped, pipes and devices have no size
+            size = hash_stream(h, f)
+            return hexdigest(h), size
+        import mmap
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            h.update(m)
+        return hexdigest(h), size
+
+def hashfile(path, algorithm='sha256'):
+    """Hash of a file ('-' for stdin) as hex"""
+    return hash_path(algorithm, path)[0]
+
+def hashtext(data, algorithm='sha256'):
+    """Hash of a string with any available algorithm as hex"""
+    if isinstance(data, int):
+        data = str(data)
+    h = new_hash(algorithm)
+    h.update(data.encode())
+    return hexdigest(h)
+
 def crc32(data):
     """Calculate CRC32 checksum."""
+    import zlib
     if isinstance(data, int):
         data = str(data)
-    return binascii.crc32(data.encode()) & 0xffffffff
+    return zlib.crc32(data.encode())
 
 def md5(data):
     """Calculate MD5 hash."""
-    if isinstance(data, int):
-        data = str(data)
-    return hashlib.md5(data.encode()).hexdigest()
+    return hashtext(data, 'md5')
 
 def sha256(data):
     """Calculate SHA256 hash."""
-    if isinstance(data, int):
-        data = str(data)
-    return hashlib.sha256(data.encode()).hexdigest()
+    return hashtext(data, 'sha256')
+
+def run_hash(algorithm, paths, jobs=None, verbose=False):
+    """
+    Print 'digest  path' for every file like sha256sum, hashing them on a
+    thread pool of jobs threads (every core by default).
+    """
+    new_hash(algorithm)
+    paths = paths or ['-']
+    if not jobs or jobs < 1:
+        jobs = os.cpu_count() or 1
+
+    def job(path):
+        try:
+            return hash_path(algorithm, path), None
+        except OSError as e:
+            return (None, 0), e.strerror or str(e)
+
+    start = time.perf_counter()
+    total = failed = 0
+    if jobs > 1 and len(paths) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(min(jobs, len(paths)))
+        results = pool.map(job, paths)
+    else:
+        pool = None
+        results = map(job, paths)
+    try:
+        for path, ((digest, size), error) in zip(paths, results):
+            if error is not None:
+                failed += 1
+                print(f"{CL['red']}Error{CL['reset']}: {path}: {error}")
+            else:
+                print(f"{digest}  {path}")
+                total += size
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f"{len(paths)} files, {failed} failed, {total / 1e6:,.1f} MB in {elapsed:.3f}s "
+              f"({total / 1e6 / max(elapsed, 1e-9):,.1f} MB/s)", file=sys.stderr)
     
 def encode_base64(text):
-    return base64.b64encode(text.encode()).decode()
+    import base64
+    if isinstance(text, str):
+        text = text.encode()
+    return base64.b64encode(text).decode()
 
 def decode_base64(encoded):
-    return base64.b64decode(encoded).decode()
+    """Decoded text, or bytes when the data is not UTF-8"""
+    import base64
+    data = base64.b64decode(encoded)
+    try:
+        return data.decode()
+    except UnicodeDecodeError:
+        return data
+
+# --- Streaming codecs ---
+# Encoders are fed whole groups of input bytes (3 for base64, 5 for base32)
+# and decoders whole groups of characters (4 and 8), so every chunk is coded
+# on its own and the output of the chunks just concatenates.
+CODEC_CHUNK = 1 << 20
+CODEC_WHITESPACE = b' \t\r\n\v\f'
+
+def codec(name):
+    """(bytes per group, characters per group, encode, decode) of a codec"""
+    import base64
+    import binascii
+    codecs = {
+        'base64': (3, 4, lambda data: binascii.b2a_base64(data, newline=False), binascii.a2b_base64),
+        'base32': (5, 8, base64.b32encode, base64.b32decode),
+        'hex': (1, 2, binascii.hexlify, binascii.unhexlify),
+    }
+    if name.lower() not in codecs:
+        raise ValueError(f"{CL['red']}Unknown codec{CL['reset']}: {name} (use {', '.join(codecs)})")
+    return codecs[name.lower()]
+
+def read_full(stream, view):
+    """readinto until view is full or the stream ends, returns the bytes read"""
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+def encode_stream(name, stream, chunk_size=CODEC_CHUNK):
+    """
+    Encode a binary stream, yielding encoded chunks. Reads go into one
+    buffer sized to a whole number of groups and are encoded from a
+    memoryview of it, so no input is copied.
+    """
+    group, _, encode, _ = codec(name)
+    buffer = bytearray(max(chunk_size - chunk_size % group, group))
+    view = memoryview(buffer)
+    while True:
+        n = read_full(stream, view)
+        if n:
+            yield encode(view[:n])
+        if n < len(buffer):
+            return
+
+def decode_stream(name, stream, chunk_size=CODEC_CHUNK):
+    """
+    Decode a binary stream, yielding decoded chunks. Whitespace and line
+    breaks are dropped; characters left over from a partial group are
+    carried to the next chunk.
+    """
+    _, group, _, decode = codec(name)
+    buffer = bytearray(max(chunk_size, group))
+    view = memoryview(buffer)
+    carry = b''
+    while True:
+        n = read_full(stream, view)
+        if carry or any(buffer.find(c, 0, n) >= 0 for c in CODEC_WHITESPACE):
+            data = memoryview(carry + view[:n].tobytes().translate(None, CODEC_WHITESPACE))
+        else:
+            # no line breaks, decode straight from the buffer
+            data = view[:n]
+        cut = len(data) if n < len(buffer) else len(data) - len(data) % group
+        if cut:
+            yield decode(data[:cut])
+        carry = data[cut:].tobytes()
+        if n < len(buffer):
+            return
+
+def run_codec(name, decode=False, path='-', verbose=False):
+    """Stream a file or stdin through a codec to stdout"""
+    start = time.perf_counter()
+    stream = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    out = sys.stdout.buffer
+    size = 0
+    try:
+        for chunk in (decode_stream if decode else encode_stream)(name, stream):
+            out.write(chunk)
+            size += len(chunk)
+        if not decode:
+            out.write(b'\n')
+        out.flush()
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f"{size / 1e6:,.1f} MB written in {elapsed:.3f}s ({size / 1e6 / max(elapsed, 1e-9):,.1f} MB/s)",
+              file=sys.stderr)
     
 # --- Color Conversion Functions ---
 def hex2rgb(hex_color):
@@ -890,54 +1881,323 @@ def rgb2hex(r, g, b):
 
 def rgb2hsl(r, g, b):
     """Convert RGB to HSL."""
+    import colorsys
     r, g, b = r/255, g/255, b/255
     h, l, s = colorsys.rgb_to_hls(r, g, b)
     return (round(h*360, 2), round(s*100, 2), round(l*100, 2))
 
 def hsl2rgb(h, s, l):
     """Convert HSL to RGB."""
+    import colorsys
+    if not (math.isfinite(h) and 0 <= s <= 100 and 0 <= l <= 100):
+        raise ValueError(f"{CL['red']}{HSL_RANGE_ERROR}{CL['reset']}")
     r, g, b = colorsys.hls_to_rgb(h/360, l/100, s/100)
     return (round(r*255), round(g*255), round(b*255))
-    
-def write(*args, **kwargs):
+
+# --- Color arrays ---
+# Whole palettes and images are converted in one pass. Colors travel as flat
+# sequences: RGB as bytes (r, g, b, r, g, b, ...), HSL as floats. The NumPy
+# versions follow colorsys step by step so they give the scalar results.
+COLOR_SPACES = ('hex', 'rgb', 'hsl')
+HSL_RANGE_ERROR = "Saturation and lightness must be from 0 to 100"
+COLOR_CHUNK = 65536
+HEX_COLOR = re.compile(r'#?\b([0-9a-fA-F]{6})\b')
+PPM_FIELD = re.compile(rb'\s*(?:#[^\n]*\n\s*)*(\d+)')
+
+def parse_ppm(data):
+    """(width, height, flat RGB bytes) of a binary P6 or plain P3 PPM image"""
+    fields = []
+    pos = 2
+    while len(fields) < 3:
+        match = PPM_FIELD.match(data, pos)
+        if not match:
+            raise ValueError(f"{CL['red']}Invalid PPM header{CL['reset']}")
+        fields.append(int(match.group(1)))
+        pos = match.end()
+    width, height, maxval = fields
+    count = width * height * 3
+    if data[:2] == b'P6':
+        if maxval > 255:
+            raise ValueError(f"{CL['red']}Only 8 bit PPM images are supported{CL['reset']}")
+        pixels = memoryview(data)[pos + 1:pos + 1 + count]
+    else:
+        pixels = bytes(int(v) for v in data[pos:].split()[:count])
+    if len(pixels) != count:
+        raise ValueError(f"{CL['red']}PPM image is truncated{CL['reset']}")
+    if maxval != 255:
+        pixels = bytes(v * 255 // maxval for v in pixels)
+    return width, height, pixels
+
+def read_colors(space, data, numpy=None):
     """
-    Enhanced write function with:
-    - Variable interpolation
-    - Multiple arguments concatenation
-    - Color formatting
-    - Expression evaluation
-    - Error handling
+    Flat colors from a buffer: hex codes, 'r,g,b' or 'h,s,l' text, or for
+    rgb a PPM image. Returns bytes for hex and rgb, floats for hsl.
     """
-    global CL, STORE, OLD
-    
-    # Prepare variables
-    context = {
-        **STORE,
-        **CL,
-        'res': OLD,
-        'date': datetime.datetime.now().strftime('%Y-%m-%d'),
-        'time': datetime.datetime.now().strftime('%H:%M:%S'),
-        'pi': math.pi,
-        'e': math.e,
-    }
-    
-    # Process each argument
-    processed_args = []
-    for arg in args:
-        try:
+    if space == 'rgb' and data[:2] in (b'P6', b'P3'):
+        return parse_ppm(data)[2]
+    text = bytes(data).decode()
+    if space == 'hex':
+        return bytes.fromhex(''.join(HEX_COLOR.findall(text)))
+    text = ' '.join(line for line in text.replace(',', ' ').splitlines() if not line.lstrip().startswith('#'))
+    if numpy is not None:
+        values = numpy.array(text.split(), dtype=float)
+    else:
+        values = array('d', map(float, text.split()))
+    if len(values) % 3:
+        raise ValueError(f"{CL['red']}Expected 3 values per color{CL['reset']}: {len(values)} values")
+    if space == 'hsl':
+        # the same range hsl2rgb accepts; hue wraps around
+        if numpy is not None:
+            h, sl = values[0::3], values[1::3].tolist() + values[2::3].tolist()
+            invalid = not numpy.isfinite(h).all()
+        else:
+            h, sl = values[0::3], values[1::3] + values[2::3]
+            invalid = not all(map(math.isfinite, h))
+        if invalid or not all(0 <= v <= 100 for v in set(sl)):
+            raise ValueError(f"{CL['red']}{HSL_RANGE_ERROR}{CL['reset']}")
+        return values
+    if numpy is not None:
+        invalid = ((values < 0) | (values > 255) | (values % 1 != 0)).any()
+    else:
+        invalid = any(v < 0 or v > 255 or v != int(v) for v in set(values))
+    if invalid:
+        raise ValueError(f"{CL['red']}RGB values must be integers from 0 to 255{CL['reset']}")
+    return bytes(map(int, values)) if numpy is None else values.astype(numpy.uint8).tobytes()
+
+def round_colors(numpy, values):
+    """numpy.round(values, 2), with halfway cases redone by round() as the scalar functions do"""
+    rounded = numpy.round(values, 2)
+    ties = numpy.abs((values * 100) % 1 - 0.5) < 1e-6
+    if ties.any():
+        rounded[ties] = [round(v, 2) for v in values[ties].tolist()]
+    return rounded
+
+def rgb_to_hsl_colors(rgb, numpy=None):
+    """rgb2hsl over flat RGB bytes, as flat h, s, l floats"""
+    if numpy is None:
+        # colorsys.rgb_to_hls inlined. Saturation and lightness depend only on
+        # the largest and smallest channel, so they come from a table, and
+        # images repeat colors, so each distinct color is converted once.
+        cache = {}
+        extremes = {}
+        out = []
+        values = iter(rgb)
+        for color in zip(values, values, values):
+            hsl = cache.get(color)
+            if hsl is None:
+                high, low = max(color), min(color)
+                maxc, minc = high / 255, low / 255
+                sl = extremes.get((high, low))
+                if sl is None:
+                    l = (maxc + minc) / 2.0
+                    s = 0.0 if high == low else (maxc - minc) / (maxc + minc) if l <= 0.5 else (maxc - minc) / (2.0 - maxc - minc)
+                    sl = extremes[high, low] = (round(s * 100, 2), round(l * 100, 2))
+                if high == low:
+                    hsl = (0.0,) + sl
+                else:
+                    r, g, b = color[0] / 255, color[1] / 255, color[2] / 255
+                    rangec = maxc - minc
+                    rc = (maxc - r) / rangec
+                    gc = (maxc - g) / rangec
+                    bc = (maxc - b) / rangec
+                    if r == maxc:
+                        h = bc - gc
+                    elif g == maxc:
+                        h = 2.0 + rc - bc
+                    else:
+                        h = 4.0 + gc - rc
+                    hsl = (round((h / 6.0) % 1.0 * 360, 2),) + sl
+                cache[color] = hsl
+            out += hsl
+        return out
+    r, g, b = numpy.frombuffer(rgb, dtype=numpy.uint8).reshape(-1, 3).T / 255.0
+    maxc = numpy.maximum(numpy.maximum(r, g), b)
+    minc = numpy.minimum(numpy.minimum(r, g), b)
+    sumc = maxc + minc
+    rangec = maxc - minc
+    l = sumc / 2.0
+    grey = rangec == 0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        s = numpy.where(l <= 0.5, rangec / sumc, rangec / (2.0 - maxc - minc))
+        rc = (maxc - r) / rangec
+        gc = (maxc - g) / rangec
+        bc = (maxc - b) / rangec
+    h = numpy.where(r == maxc, bc - gc, numpy.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = (h / 6.0) % 1.0
+    h[grey] = 0.0
+    s[grey] = 0.0
+    return round_colors(numpy, numpy.stack((h * 360, s * 100, l * 100), axis=1).ravel())
+
+def hsl_to_rgb_colors(hsl, numpy=None):
+    """hsl2rgb over flat h, s, l floats, as flat RGB bytes"""
+    if numpy is None:
+        # colorsys.hls_to_rgb inlined
+        def channel(m1, m2, hue):
+            hue = hue % 1.0
+            if hue < 1/6:
+                return m1 + (m2 - m1) * hue * 6.0
+            if hue < 0.5:
+                return m2
+            if hue < 2/3:
+                return m1 + (m2 - m1) * (2/3 - hue) * 6.0
+            return m1
+        out = []
+        values = iter(hsl)
+        for h, s, l in zip(values, values, values):
+            h, s, l = h / 360, s / 100, l / 100
+            if s == 0.0:
+                r = g = b = l
+            else:
+                m2 = l * (1.0 + s) if l <= 0.5 else l + s - (l * s)
+                m1 = 2.0 * l - m2
+                r, g, b = channel(m1, m2, h + 1/3), channel(m1, m2, h), channel(m1, m2, h - 1/3)
+            out += (round(r * 255), round(g * 255), round(b * 255))
+        return bytes(out)
+    h, s, l = numpy.asarray(hsl, dtype=float).reshape(-1, 3).T
+    h, s, l = h / 360, s / 100, l / 100
+    m2 = numpy.where(l <= 0.5, l * (1.0 + s), l + s - (l * s))
+    m1 = 2.0 * l - m2
+    channels = []
+    for hue in (h + 1/3, h, h - 1/3):
+        hue = hue % 1.0
+        v = numpy.where(hue < 1/6, m1 + (m2 - m1) * hue * 6.0,
+            numpy.where(hue < 0.5, m2,
+            numpy.where(hue < 2/3, m1 + (m2 - m1) * (2/3 - hue) * 6.0, m1)))
+        channels.append(numpy.where(s == 0.0, l, v))
+    return numpy.rint(numpy.stack(channels, axis=1) * 255).astype(numpy.uint8).tobytes()
+
+def format_colors(space, colors, numpy=None):
+    """Yield lists of color lines, COLOR_CHUNK colors at a time"""
+    if space == 'hex':
+        text = bytes(colors).hex()
+        step = COLOR_CHUNK * 6
+        for start in range(0, len(text), step):
+            yield ['#' + text[i:i+6] for i in range(start, min(start + step, len(text)), 6)]
+        return
+    step = COLOR_CHUNK * 3
+    for start in range(0, len(colors), step):
+        chunk = colors[start:start + step]
+        if numpy is not None and space == 'hsl':
+            chunk = chunk.tolist()
+        values = iter(chunk)
+        yield [f'{a},{b},{c}' for a, b, c in zip(values, values, values)]
+
+def convert_colors(conversion, data):
+    """
+    Convert a buffer of colors, ex. 'hex2hsl' over a list of hex codes or
+    'rgb2hex' over a PPM image. Yields lists of output lines.
+    """
+    source, _, target = conversion.lower().partition('2')
+    if source not in COLOR_SPACES or target not in COLOR_SPACES:
+        raise ValueError(f"{CL['red']}Unknown color conversion{CL['reset']}: {conversion} "
+                         f"(use hex, rgb or hsl, ex. rgb2hsl, hex2hsl, hsl2hex)")
+    numpy = load_numpy()
+    colors = read_colors(source, data, numpy)
+    if source == 'hsl' and target != 'hsl':
+        colors = hsl_to_rgb_colors(colors, numpy)
+    elif source != 'hsl' and target == 'hsl':
+        colors = rgb_to_hsl_colors(colors, numpy)
+    return format_colors(target, colors, numpy)
+
+def palette(path, conversion):
+    """Colors of a file converted in one pass, as a list"""
+    with open(path, 'rb') as f:
+        return [line for chunk in convert_colors(conversion, f.read()) for line in chunk]
+
+def run_colors(conversion, path='-', verbose=False):
+    """Convert the colors of a file or stdin, one color per output line"""
+    if path == '-':
+        data = sys.stdin.buffer.read()
+    else:
+        with open(path, 'rb') as f:
+            data = f.read()
+    write_chunks(convert_colors(conversion, data), verbose)
+    
+# Built-in template values, computed only when a template references them
+TEMPLATE_VALUES = {
+    'res': lambda: session().old,
+    'date': lambda: datetime.datetime.now().strftime('%Y-%m-%d'),
+    'time': lambda: datetime.datetime.now().strftime('%H:%M:%S'),
+    'pi': lambda: math.pi,
+    'e': lambda: math.e,
+}
+
+class TemplateContext:
+    """Lazy view of the built-in values, then CL, then STORE, for write()"""
+    def __getitem__(self, name):
+        if name in TEMPLATE_VALUES:
+            return TEMPLATE_VALUES[name]()
+        if name in CL:
+            return CL[name]
+        return STORE[name]
+
+TEMPLATE_CONTEXT = TemplateContext()
+FORMATTER = None
+
+def compile_template(template):
+    """
+    Parse a str.format template once into (literal, field, simple, spec, conversion)
+    tuples, cached in TEMPLATE_CACHE. Raises ValueError on malformed braces.
+    """
+    global FORMATTER
+    segments = TEMPLATE_CACHE.get(template)
+    if segments is None:
+        if FORMATTER is None:
+            import string
+            FORMATTER = string.Formatter()
+        segments = tuple(
+            (literal, field, field is not None and field.isidentifier(), spec, conversion)
+            for literal, field, spec, conversion in FORMATTER.parse(template))
+        TEMPLATE_CACHE.put(template, segments)
+    return segments
+
+def render_template(template):
+    """Format a template against TEMPLATE_CONTEXT"""
+    parts = []
+    for literal, field, simple, spec, conversion in compile_template(template):
+        parts.append(literal)
+        if field is None:
+            continue
+        if simple:
+            value = TEMPLATE_CONTEXT[field]
+        else:
+            # attribute or index access, ex. {name.upper} or {items[0]}
+            value = FORMATTER.get_field(field, (), TEMPLATE_CONTEXT)[0]
+        if conversion:
+            value = FORMATTER.convert_field(value, conversion)
+        if spec and '{' in spec:
+            spec = render_template(spec)
+        parts.append(format(value, spec) if spec else str(value))
+    return ''.join(parts)
+
+def write(*args, **kwargs):
+    """
+    Enhanced write function with:
+    - Variable interpolation
+    - Multiple arguments concatenation
+    - Color formatting
+    - Expression evaluation
+    - Error handling
+    """
+    # Process each argument
+    processed_args = []
+    for arg in args:
+        try:
             # Handle string formatting
             if isinstance(arg, str):
                 # First format with stored variables
-                formatted = arg.format(**context)
-                # Then evaluate expressions in braces
-                while True:
+                formatted = render_template(arg)
+                # Then expand variables whose values hold {references}
+                for _ in range(MAX_FORMAT_DEPTH):
+                    if '{' not in formatted and '}' not in formatted:
+                        break
                     try:
-                        new_formatted = formatted.format(**context)
-                        if new_formatted == formatted:
-                            break
-                        formatted = new_formatted
-                    except:
+                        new_formatted = render_template(formatted)
+                    except Exception:
+                        break
+                    if new_formatted == formatted:
                         break
+                    formatted = new_formatted
                 processed_args.append(formatted)
             else:
                 processed_args.append(str(arg))
@@ -950,155 +2210,495 @@ def write(*args, **kwargs):
     #print(output)
     return output
 
-def evaluate_expression(expr):
-    """Evaluate a mathematical expression safely."""
-    global OLD,ECHO
+# --- Numeric modes ---
+# 'float' is the default. 'decimal' and 'fraction' turn float literals and
+# divisions into decimal.Decimal / fractions.Fraction, and in decimal mode
+# the constants and sqrt/exp/log functions are computed at PRECISION digits.
+
+NUMERIC_MODES = ('float', 'decimal', 'fraction')
+NUMERIC_MODE = 'float'
+PRECISION = 28
+EXACT_TYPE = None
+EXACT_TYPES = ()
+# decimal.Context of the decimal mode. Every thread computes in it, not in
+# its own decimal.getcontext(), so the precision is the same everywhere.
+DECIMAL_CONTEXT = None
+# Context methods rounding like the operators, to DECIMAL_CONTEXT.prec.
+# // and % are decimal_floordiv and decimal_mod: the context's divide_int
+# and remainder truncate toward zero, float and Fraction floor.
+DECIMAL_METHODS = {
+    operator.add: 'add', operator.sub: 'subtract', operator.mul: 'multiply',
+    operator.truediv: 'divide', operator.pow: 'power', operator.neg: 'minus', operator.pos: 'plus',
+}
+
+def exact(value):
+    """Convert an int or float to the number type of the current mode"""
+    if EXACT_TYPE is None or isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if isinstance(value, float):
+        value = repr(value)
+    return EXACT_TYPE(value)
+
+def divide(a, b):
+    """Division following the current numeric mode"""
+    if NUMERIC_MODE == 'float':
+        return a / b
+    if NUMERIC_MODE == 'decimal':
+        return DECIMAL_CONTEXT.divide(exact(a), exact(b))
+    return exact(a) / exact(b)
+
+def decimal_divmod(a, b):
+    """(a // b, a % b) of decimals in DECIMAL_CONTEXT, the quotient rounded toward minus infinity"""
+    quotient, remainder = DECIMAL_CONTEXT.divmod(a, b)
+    if remainder and (remainder < 0) != (b < 0):
+        quotient = DECIMAL_CONTEXT.subtract(quotient, 1)
+        remainder = DECIMAL_CONTEXT.add(remainder, b)
+    elif not remainder:
+        remainder = remainder.copy_sign(b)  # a zero takes the divisor's sign, as with floats
+    return quotient, remainder
+
+def decimal_floordiv(a, b):
+    return decimal_divmod(a, b)[0]
+
+def decimal_mod(a, b):
+    return decimal_divmod(a, b)[1]
+
+DECIMAL_FLOOR = {operator.floordiv: decimal_floordiv, operator.mod: decimal_mod}
+
+def exact_operator(op, always=False):
+    """Wrap an arithmetic operator so ints and floats mix with exact numbers"""
+    exact_op = op
+    if NUMERIC_MODE == 'decimal':
+        exact_op = DECIMAL_FLOOR.get(op) or getattr(DECIMAL_CONTEXT, DECIMAL_METHODS[op])
+    def apply(a, b):
+        if always or isinstance(a, EXACT_TYPES) or isinstance(b, EXACT_TYPES):
+            return exact_op(exact(a), exact(b))
+        return op(a, b)
+    return apply
+
+def exact_unary(op):
+    """Wrap a unary operator so decimals round in DECIMAL_CONTEXT"""
+    exact_op = getattr(DECIMAL_CONTEXT, DECIMAL_METHODS[op])
+    def apply(a):
+        if isinstance(a, EXACT_TYPE):
+            return exact_op(a)
+        return op(a)
+    return apply
+
+def decimal_pi():
+    """pi to the current decimal precision (recipe from the decimal docs)"""
+    import decimal
+    decimal.getcontext().prec += 2
+    three = decimal.Decimal(3)
+    lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+    while s != lasts:
+        lasts = s
+        n, na = n + na, na + 8
+        d, da = d + da, da + 32
+        t = (t * n) / d
+        s += t
+    decimal.getcontext().prec -= 2
+    return +s
+
+def decimal_functions():
+    """Constants and functions computed with decimal.Decimal in DECIMAL_CONTEXT"""
+    import decimal
+    from decimal import Decimal
+    context = DECIMAL_CONTEXT
+    with decimal.localcontext(context):
+        pi = decimal_pi()
+        constants = {
+            'pi': pi,
+            'tau': 2 * pi,
+            'e': Decimal(1).exp(),
+            'phi': (1 + Decimal(5).sqrt()) / 2,
+        }
+    return dict(constants, **{
+        'sqrt': lambda x: exact(x).sqrt(context),
+        'exp': lambda x: exact(x).exp(context),
+        'log': lambda x, base=None: (exact(x).ln(context) if base is None
+                                     else context.divide(exact(x).ln(context), exact(base).ln(context))),
+        'log10': lambda x: exact(x).log10(context),
+    })
+
+def set_mode(mode, precision=None):
+    """Select the numeric mode and, for decimal, the number of significant digits"""
+    global NUMERIC_MODE, PRECISION, EXACT_TYPE, EXACT_TYPES, DECIMAL_CONTEXT
+    if mode not in NUMERIC_MODES:
+        raise ValueError(f"{CL['red']}Unknown mode{CL['reset']}: {mode} (use float, decimal or fraction)")
+    if precision is not None:
+        if int(precision) < 1:
+            raise ValueError(f"{CL['red']}Precision must be a positive integer{CL['reset']}")
+        PRECISION = int(precision)
+    NUMERIC_MODE = mode
+    # restore the float entries, then override them for decimal mode
+    NAMESPACE.update(FUNCTIONS)
+    if mode == 'float':
+        EXACT_TYPE = None
+    else:
+        import decimal
+        import fractions
+        EXACT_TYPES = (decimal.Decimal, fractions.Fraction)
+        DECIMAL_CONTEXT = decimal.Context(prec=PRECISION)
+        if mode == 'decimal':
+            EXACT_TYPE = decimal.Decimal
+            NAMESPACE.update(decimal_functions())
+        else:
+            EXACT_TYPE = fractions.Fraction
+    # literals are converted at compile time
+    EXPR_CACHE.clear()
+    SCRIPT_CACHE.clear()
+
+def show_mode():
+    if NUMERIC_MODE == 'decimal':
+        return f"{CL['white']}mode {CL['green']}decimal {CL['white']}precision {CL['green']}{PRECISION}{CL['reset']}"
+    return f"{CL['white']}mode {CL['green']}{NUMERIC_MODE}{CL['reset']}"
+
+def is_integral(value):
+    """True if a number has no fractional part"""
+    if isinstance(value, int):
+        return True
+    if isinstance(value, float):
+        return value.is_integer()
     try:
-         # Try unit conversion first (e.g., "5km to mi")
-        if re.search(r'\s+(?:to|in)\s+', expr, flags=re.IGNORECASE):
-            return parse_conversion(expr)
-            
-        # Auto-quote string arguments before evaluation
-        expr = auto_quote(expr)
-        expression = expr.lower()        
-        if expression.startswith('ask'):
-            return ask(expr[5:-2])
-        if expression.startswith('@'):
-            ss(expr[1:])
-            return OLD
-        if expr.lower().startswith('!'):
-            rs(expr[1:])
-            return STORE[expr[1:]]
-        
-        if expression.startswith('help'):
-            s = expression.split()
-            if len(s) == 1:
-                showhelp('')
-                return OLD
-            else:
-                showhelp(s[1])
-                return OLD
-        
-        if expression.startswith('ls') or expression.startswith('list'):
-            listfiles()
-            return OLD
-        
-        if expression.startswith('echo'):
-            ECHO = 1
-            return OLD
-        if expression.startswith('noecho'):
-            ECHO = 0
-            return OLD
-            
-        if expression in ['c','ce']:
-            OLD = 0
-            result = 0
+        return value == int(value)
+    except (ValueError, OverflowError):
+        return False
+
+# --- Safe expression compiler ---
+# Expressions are parsed once with ast and turned into a tree of closures.
+# Only the node types below are accepted, so attribute access, lambdas,
+# comprehensions etc. are rejected before anything runs.
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.LShift: operator.lshift,
+    ast.RShift: operator.rshift,
+    ast.BitOr: operator.or_,
+    ast.BitXor: operator.xor,
+    ast.BitAnd: operator.and_,
+}
+
+# operators that follow the numeric mode
+EXACT_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+    ast.Invert: operator.invert,
+    ast.Not: operator.not_,
+}
+
+COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+def compile_node(node):
+    """Turn a whitelisted ast node into a closure taking the namespace"""
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, float):
+            value = exact(value)
+        return lambda ns: value
+
+    if isinstance(node, ast.Name):
+        # stored variables are read through their slot and shadow built-in
+        # constants, but not functions; batch scopes bind their columns first
+        name = node.id
+        slot = symbol(name)
+        def load(ns):
+            store = session().store
+            if ns is NAMESPACE:
+                value = store.slot_value(slot)
+                if value is not UNSET and not callable(ns.get(name)):
+                    return value
+            try:
+                return ns[name]
+            except KeyError:
+                pass
+            value = store.slot_value(slot)
+            if value is UNSET:
+                raise NameError(f"name '{name}' is not defined")
+            return value
+        return load
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        op = BINARY_OPERATORS[type(node.op)]
+        if EXACT_TYPE is not None and type(node.op) in EXACT_OPERATORS:
+            op = exact_operator(op, isinstance(node.op, ast.Div))
+        left = compile_node(node.left)
+        right = compile_node(node.right)
+        return lambda ns: op(left(ns), right(ns))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        op = UNARY_OPERATORS[type(node.op)]
+        if NUMERIC_MODE == 'decimal' and op in DECIMAL_METHODS:
+            op = exact_unary(op)
+        operand = compile_node(node.operand)
+        return lambda ns: op(operand(ns))
+
+    if isinstance(node, ast.BoolOp):
+        values = [compile_node(v) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def both(ns):
+                for value in values:
+                    result = value(ns)
+                    if not result:
+                        return result
+                return result
+            return both
+        def either(ns):
+            for value in values:
+                result = value(ns)
+                if result:
+                    return result
             return result
-        elif expression in ['cls','clear','cl']:
-            os.system('clear')
-            return OLD
-        elif expression in ['reset']:
-            clearvars()
-            return OLD
-        
-        # if line begins with a calc, add the old number
-        #expr = expr.replace(" ","")
-        if expr[:1] in ['+','-','*','/','^']:
-            expr = str(OLD) + expr
+        return either
+
+    if isinstance(node, ast.Compare):
+        if not all(type(op) in COMPARE_OPERATORS for op in node.ops):
+            raise ValueError(f"{CL['red']}Unsupported comparison{CL['reset']}")
+        left = compile_node(node.left)
+        ops = [COMPARE_OPERATORS[type(op)] for op in node.ops]
+        rights = [compile_node(c) for c in node.comparators]
+        if len(ops) == 1:
+            op, right = ops[0], rights[0]
+            return lambda ns: op(left(ns), right(ns))
+        def chain(ns):
+            a = left(ns)
+            for op, right in zip(ops, rights):
+                b = right(ns)
+                if not op(a, b):
+                    return False
+                a = b
+            return True
+        return chain
+
+    if isinstance(node, ast.IfExp):
+        test = compile_node(node.test)
+        body = compile_node(node.body)
+        orelse = compile_node(node.orelse)
+        return lambda ns: body(ns) if test(ns) else orelse(ns)
+
+    if isinstance(node, ast.Call):
+        func = compile_node(node.func)
+        if any(isinstance(a, ast.Starred) for a in node.args) or \
+                any(k.arg is None for k in node.keywords):
+            raise ValueError(f"{CL['red']}Unsupported argument unpacking{CL['reset']}")
+        args = [compile_node(a) for a in node.args]
+        keywords = [(k.arg, compile_node(k.value)) for k in node.keywords]
+        if keywords:
+            return lambda ns: func(ns)(*[a(ns) for a in args],
+                                       **{k: v(ns) for k, v in keywords})
+        if len(args) == 1:
+            arg = args[0]
+            return lambda ns: func(ns)(arg(ns))
+        if len(args) == 2:
+            arg1, arg2 = args
+            return lambda ns: func(ns)(arg1(ns), arg2(ns))
+        return lambda ns: func(ns)(*[a(ns) for a in args])
+
+    if isinstance(node, (ast.Tuple, ast.List)) and isinstance(node.ctx, ast.Load):
+        items = [compile_node(e) for e in node.elts]
+        kind = tuple if isinstance(node, ast.Tuple) else list
+        return lambda ns: kind([i(ns) for i in items])
+
+    if isinstance(node, ast.Subscript):
+        value = compile_node(node.value)
+        index = compile_node(node.slice)
+        return lambda ns: value(ns)[index(ns)]
+
+    if isinstance(node, ast.Slice):
+        parts = [compile_node(p) if p is not None else (lambda ns: None)
+                 for p in (node.lower, node.upper, node.step)]
+        lower, upper, step = parts
+        return lambda ns: slice(lower(ns), upper(ns), step(ns))
+
+    raise ValueError(f"{CL['red']}Unsupported expression{CL['reset']}: {type(node).__name__}")
+
+def compile_expression(source):
+    """Parse an expression and return a closure evaluating it against a namespace"""
+    source = source.strip()
+    tree = ast.parse(source, '<string>', 'eval')
+    if EXACT_TYPE is not None:
+        # take float literals from their text so no digits are lost
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, float):
+                try:
+                    node.value = EXACT_TYPE(ast.get_source_segment(source, node))
+                except (ValueError, ArithmeticError):
+                    pass
+    return compile_node(tree.body)
+
+class LRUCache:
+    """Small least-recently-used cache with hit/miss counters, safe to share between threads"""
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def resize(self, maxsize):
+        with self.lock:
+            self.maxsize = maxsize
+            while len(self.data) > max(maxsize, 0):
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return f"{CL['white']}size {len(self.data)}/{self.maxsize} {CL['green']}hits {self.hits} {CL['red']}misses {self.misses}{CL['reset']}"
+
+# preprocessed source and compiled closure of evaluated expressions
+EXPR_CACHE = LRUCache()
+# parsed formatvars templates
+FORMAT_CACHE = LRUCache()
+# parsed write() templates
+TEMPLATE_CACHE = LRUCache()
+# parsed calendar dates
+DATE_CACHE = LRUCache(DATE_CACHE_SIZE)
+
+def calculate(expr):
+    """Evaluate a calculator line, raising on errors."""
+    current = session()
+    # Repeated expressions skip preprocessing and compilation
+    key = expr.strip()
+    if key[:1] in ['+','-','*','/','^']:
+        key = 'result' + key
+    cached = EXPR_CACHE.get(key)
+    if cached is not None:
+        return cached[1](NAMESPACE)
+
+     # Try unit conversion first (e.g., "5km to mi")
+    if CONVERSION_SPLIT.search(expr):
+        return parse_conversion(expr)
         
-        # Replace common constants and functions
-        expr = expr.replace('^', '**')
-        #expr = expr.replace('%', '*0.01')
-       
-        # Check for invalid characters for security
-
-        if not re.match(r'^[\d\s+\-*/.()^%&|~<>{}#xboabcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ,_"\']+$', expr):
-            raise ValueError(f"{CL['red']}Expression contains invalid characters{CL['reset']}")
-            
-        # Evaluate the expression
-        result = eval(expr, {'__builtins__': None}, {
-            'sin': math.sin,
-            'cos': math.cos,
-            'tan': math.tan,
-            'sqrt': math.sqrt,
-            'log': math.log,
-            'log10': math.log10,
-            'log2': math.log2,
-            'exp': math.exp,
-            'radians': math.radians,
-            'degrees': math.degrees,
-            'pi': math.pi,
-            'phi': 1.61803398874989484820,
-            'tau':math.tau,
-            'crc32': crc32, 'md5': md5, 'sha256': sha256,
-            'oct': tooct,
-            'hex': tohex,
-            'curt': curt,
-            'result': OLD,
-            'shl': lambda x, y: x << y,  # Left shift
-            'shr': lambda x, y: x >> y,  # Right shift
-            'e': math.e,
-            'big': big_numbers(str(OLD)),
-            'b': big_numbers(str(OLD)),
-            'hex2rgb': hex2rgb,
-            'rgb2hex': rgb2hex,
-            'rgb2hsl': rgb2hsl,
-            'hsl2rgb': hsl2rgb,
-            'len': slen,
-            'length': slen,
-            'repeat': repeat,
-            'px2cm': pixels_to_cm,
-            'cm2px': cm_to_pixels,
-            'dpi_presets': show_dpi_presets(),
-            'DPI_SCREEN': 96,
-            'DPI_PRINT': 300,
-            'wavelength': wavelength,
-            'roman': roman,
-            'base64': encode_base64,
-            'decodebase64': decode_base64,
-            'now'  : datetime.datetime.now(),
-            'date' : datetime.datetime.now().strftime('%Y-%m-%d'),
-            'year' : int(datetime.datetime.now().strftime('%Y')),
-            'month' : int(datetime.datetime.now().strftime('%m')),
-            'time' : time.strftime('%H:%M', time.localtime()),
-            'leap' : is_leap,
-            'weekday' : weekday_name,
-            'random' : random_int,
-            'monthdays' : monthdays,
-            'addpercent' : addpercent,
-            'subpercent' : subpercent,
-            'cal' : cal,
-            'prime' : is_prime,
-            'ss' : ss,
-            'rs' : rs,
-            'store' : ss,
-            'restore' : rs,
-            'var' : show_all(),
-            'vars' : show_all(),
-            'file' : executefile,
-            'write': write,
-            'set' : setvar,
-            'print': write,
-            'daysbetween': days_between,
-            'adddays': add_days,
-            'dayofyear': day_of_year,
-            'weeknumber': week_number,
-            'weekend': is_weekend,
-            'date2unix': date_to_unix,
-            'unix2date': unix_to_date,
-            'unix2gregorian': unix_to_gregorian,
-            'unix2julian': unix_to_julian
-
-        })
+    # Auto-quote string arguments before evaluation
+    expr = auto_quote(expr)
+    expression = expr.lower()        
+    if expression.startswith('ask'):
+        return ask(expr[5:-2])
+    if expression.startswith('@'):
+        ss(expr[1:])
+        return current.old
+    if expr.lower().startswith('!'):
+        rs(expr[1:])
+        return STORE[expr[1:]]
+    
+    if expression.startswith('help'):
+        s = expression.split()
+        if len(s) == 1:
+            showhelp('')
+            return current.old
+        else:
+            showhelp(s[1])
+            return current.old
+    
+    if expression.startswith('ls') or expression.startswith('list'):
+        listfiles()
+        return current.old
+    
+    if expression.startswith('echo'):
+        current.echo = 1
+        return current.old
+    if expression.startswith('noecho'):
+        current.echo = 0
+        return current.old
         
-        #print('# '+expr)
+    if expression in ['c','ce']:
+        current.old = 0
+        result = 0
         return result
+    elif expression in ['cls','clear','cl']:
+        if not current.terminal:
+            raise ValueError(f"{expression} is not available without a terminal")
+        os.system('clear')
+        return current.old
+    elif expression in ['reset']:
+        clearvars()
+        return current.old
+    elif expression == 'mode' or expression.startswith('mode '):
+        s = expression.split()
+        if len(s) > 1:
+            set_mode(s[1], s[2] if len(s) > 2 else None)
+        print(show_mode())
+        return current.old
+    elif expression.startswith('cache'):
+        s = expression.split()
+        if len(s) > 1 and s[1] == 'clear':
+            EXPR_CACHE.clear()
+        elif len(s) > 1:
+            EXPR_CACHE.resize(int(s[1]))
+        print(EXPR_CACHE.stats())
+        return current.old
+    
+    # if line begins with a calc, apply it to the last result. The result
+    # is read by name, as text it would not keep its value in every mode
+    # (2/3 in fraction mode, 1E+30 in decimal mode)
+    #expr = expr.replace(" ","")
+    if expr[:1] in ['+','-','*','/','^']:
+        expr = 'result' + expr
+    
+    # Replace common constants and functions
+    expr = expr.replace('^', '**')
+    #expr = expr.replace('%', '*0.01')
+        
+    # Compile against the whitelisted node set and evaluate
+    code = compile_expression(expr)
+    EXPR_CACHE.put(key, (expr, code))
+    result = code(NAMESPACE)
+    
+    #print('# '+expr)
+    return result
+
+def evaluate_expression(expr):
+    """Evaluate a mathematical expression safely."""
+    try:
+        return calculate(expr)
     except Exception as e:
         return f"{CL['red']}Error{CL['reset']}: {str(e)}"
         
 def format_result(result):
     """Enhanced output formatting with color and prime support."""
-    global OLD,CL
+    current = session()
+    CL = current.cl
     try:
         output = []
         
@@ -1117,11 +2717,13 @@ def format_result(result):
                 return '\n'.join(output)
         
         # Handle numbers
-        if isinstance(result, (int, float)):
-            is_integer = isinstance(result, int) or result.is_integer()
-            OLD=result
+        if isinstance(result, (int, float) + EXACT_TYPES):
+            is_integer = is_integral(result)
+            current.old=result
             
             output.append(f"{CL['green']}= {CL['white']}{result}")
+            if not is_integer and not isinstance(result, float):
+                output.append(f"{CL['cyan']}~ {float(result)}")
             if is_integer:
                 num = int(result)
                 output.extend([
@@ -1138,6 +2740,367 @@ def format_result(result):
     except Exception as e:
         return f"{CL['red']}Format error{CL['reset']}: {str(e)}"
         
+def open_input(path):
+    """Open a file for reading, '-' is stdin"""
+    if path == '-':
+        return sys.stdin
+    return open(path, 'r')
+
+def find_script(filename):
+    """Resolve a script name, adding the .calc extension if needed. '-' is stdin."""
+    filename = filename.strip()
+    if filename == '-' or os.path.isfile(filename):
+        return filename
+    if os.path.isfile(filename+'.calc'):
+        return filename+'.calc'
+    raise ValueError(f"File not found: {filename}")
+
+# --- Script compiler ---
+# A script is turned once into a list of instructions
+#   [kind, line number, line, payload, compiled closure]
+# kind is 'expr' (payload: preprocessed source, compiled on first run),
+# 'store' (@name), 'convert' (value, from unit, to unit), 'pause', or
+# 'command' for everything calculate dispatches itself (ask, echo, mode...).
+# Blocks nest instruction lists in their payload:
+#   for NAME in START..STOP[:STEP] / for NAME in EXPR  ('for': name, start, stop, step, body)
+#   while EXPR                  ('while': condition, body)
+#   if EXPR / elif EXPR / else  ('if': [(condition, body), ...], condition None for else)
+#   def NAME(ARGS)              ('def': name, parameters, body)
+#   return EXPR                 ('return': expression)
+# each closed by 'end'. Conditions and bounds are 'expr' instructions.
+# Compiled scripts are kept in SCRIPT_CACHE while the file is unchanged and,
+# with --script-cache, written next to the script as name.calcc.
+
+SCRIPT_CACHE = {}
+SCRIPT_CACHE_EXT = '.calcc'
+SCRIPT_CACHE_MAGIC = 'calculus-script'
+PERSIST_SCRIPTS = False
+
+# first words of lines that calculate handles as commands
+SCRIPT_COMMANDS = ('ask', '!', 'help', 'ls', 'list', 'echo', 'noecho', 'mode', 'cache')
+SCRIPT_WORDS = ('c', 'ce', 'cls', 'clear', 'cl', 'reset')
+
+BLOCK_WORD = re.compile(r'(for|while|if|elif|else|def|return|end)\b\s*(.*)$')
+FOR_HEADER = re.compile(r'([A-Za-z_]\w*)\s+in\s+(.+)$')
+DEF_HEADER = re.compile(r'([A-Za-z_]\w*)\s*\(\s*([\w\s,]*)\)$')
+
+class ScriptReturn(Exception):
+    """Raised by 'return' to leave a user function"""
+    def __init__(self, value):
+        self.value = value
+
+def expression_instruction(line_num, line, expr, continues=False):
+    """
+    'expr' instruction for an expression, preprocessed like calculate does.
+    With continues, a leading operator applies to the last result.
+    """
+    expr = auto_quote(expr.strip())
+    if continues and expr[:1] in ['+','-','*','/','^']:
+        expr = 'result' + expr
+    return ['expr', line_num, line, expr.replace('^', '**'), None]
+
+def compile_line(line_num, line):
+    """Instruction for one stripped script line, None for blank lines and comments"""
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('pause'):
+        return ['pause', line_num, line, None, None]
+    if CONVERSION_SPLIT.search(line):
+        match = CONVERSION_PATTERN.match(line)
+        if match:
+            value, from_unit, to_unit = match.groups()
+            return ['convert', line_num, line, (float(value), from_unit, to_unit), None]
+        return ['command', line_num, line, None, None]
+    expr = auto_quote(line)
+    expression = expr.lower()
+    if expression.startswith('@'):
+        return ['store', line_num, line, expr[1:], None]
+    if expression.startswith(SCRIPT_COMMANDS) or expression in SCRIPT_WORDS:
+        return ['command', line_num, line, None, None]
+    # a line that begins with an operator continues the last result
+    return expression_instruction(line_num, line, line, True)
+
+def compile_header(line_num, line, word, rest):
+    """Instruction for the first line of a block, its body filled in later"""
+    def error(message):
+        return ValueError(f"{CL['red']}Line {line_num}{CL['reset']}: {message}: {line}")
+    if word == 'for':
+        match = FOR_HEADER.match(rest)
+        if not match:
+            raise error("use 'for name in start..stop[:step]' or 'for name in expression'")
+        name, values = match.groups()
+        start, sep, stop = values.partition('..')
+        if not sep:
+            return ['for', line_num, line, (name, expression_instruction(line_num, line, values), None, None, []), None]
+        stop, _, step = stop.partition(':')
+        bounds = [expression_instruction(line_num, line, part) if part.strip() else None
+                  for part in (start, stop, step)]
+        if bounds[0] is None or bounds[1] is None:
+            raise error("missing range bound")
+        return ['for', line_num, line, (name, *bounds, []), None]
+    if word == 'def':
+        match = DEF_HEADER.match(rest)
+        if not match:
+            raise error("use 'def name(a, b)'")
+        name, parameters = match.groups()
+        parameters = tuple(p.strip() for p in parameters.split(',') if p.strip())
+        if not all(p.isidentifier() for p in parameters):
+            raise error("invalid parameter")
+        return ['def', line_num, line, (name, parameters, []), None]
+    if not rest:
+        raise error("missing condition")
+    condition = expression_instruction(line_num, line, rest)
+    if word == 'while':
+        return ['while', line_num, line, (condition, []), None]
+    return ['if', line_num, line, [(condition, [])], None]
+
+def iter_instructions(lines):
+    """
+    Compile script lines, yielding each top level instruction once it is
+    complete. Raises ValueError for unbalanced blocks.
+    """
+    # open blocks as (instruction, body being filled)
+    stack = []
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        match = BLOCK_WORD.match(line)
+        if match is None:
+            instruction = compile_line(line_num, line)
+        else:
+            word, rest = match.groups()
+            instruction = None
+            def error(message):
+                return ValueError(f"{CL['red']}Line {line_num}{CL['reset']}: {message}: {line}")
+            if word in ('elif', 'else'):
+                if not stack or stack[-1][0][0] != 'if' or stack[-1][0][3][-1][0] is None:
+                    raise error(f"'{word}' without 'if'")
+                branches = stack[-1][0][3]
+                condition = expression_instruction(line_num, line, rest) if word == 'elif' else None
+                if word == 'elif' and not rest:
+                    raise error("missing condition")
+                branches.append((condition, []))
+                stack[-1] = (stack[-1][0], branches[-1][1])
+                continue
+            if word == 'end':
+                if not stack:
+                    raise error("'end' without block")
+                instruction = stack.pop()[0]
+            elif word == 'return':
+                if not any(block[0][0] == 'def' for block in stack):
+                    raise error("'return' outside 'def'")
+                instruction = ['return', line_num, line, expression_instruction(line_num, line, rest or 'None'), None]
+            else:
+                header = compile_header(line_num, line, word, rest)
+                body = header[3][0][1] if word == 'if' else header[3][-1]
+                stack.append((header, body))
+                continue
+        if instruction is None:
+            continue
+        if stack:
+            stack[-1][1].append(instruction)
+        else:
+            yield instruction
+    if stack:
+        header = stack[-1][0]
+        raise ValueError(f"{CL['red']}Line {header[1]}{CL['reset']}: missing 'end': {header[2]}")
+
+def compile_lines(lines):
+    """Instructions for the lines of a script"""
+    return list(iter_instructions(lines))
+
+def load_script(filename):
+    """
+    Compiled instructions of a script file, reusing SCRIPT_CACHE or a
+    persisted name.calcc while the file's mtime and size are unchanged.
+    """
+    try:
+        info = os.stat(filename)
+    except OSError as e:
+        raise ValueError(f"Error processing file: {str(e)}")
+    signature = (info.st_mtime_ns, info.st_size)
+    cached = SCRIPT_CACHE.get(filename)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    instructions = None
+    cache_path = os.path.splitext(filename)[0] + SCRIPT_CACHE_EXT
+    if PERSIST_SCRIPTS:
+        instructions = read_script_cache(cache_path, signature)
+    if instructions is None:
+        try:
+            with open(filename, 'r') as f:
+                instructions = compile_lines(f)
+        except OSError as e:
+            raise ValueError(f"Error processing file: {str(e)}")
+        if PERSIST_SCRIPTS:
+            write_script_cache(cache_path, signature, instructions)
+    SCRIPT_CACHE[filename] = (signature, instructions)
+    return instructions
+
+def read_script_cache(path, signature):
+    """Instructions from a persisted script cache, None if missing or stale"""
+    import marshal
+    try:
+        with open(path, 'rb') as f:
+            magic, version, saved, instructions = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if magic != SCRIPT_CACHE_MAGIC or version != VER or saved != signature:
+        return None
+    return instructions
+
+def write_script_cache(path, signature, instructions):
+    """
+    Persist the preprocessed instructions of a script. Called before they
+    run, so no compiled closures are attached yet.
+    """
+    import marshal
+    try:
+        with open(path, 'wb') as f:
+            marshal.dump((SCRIPT_CACHE_MAGIC, VER, signature, instructions), f)
+    except (OSError, ValueError):
+        pass  # a read-only directory just means no persisted cache
+
+def execute(instruction):
+    """Run one instruction and return its result"""
+    kind = instruction[0]
+    if kind == 'expr':
+        code = instruction[4]
+        if code is None:
+            code = instruction[4] = compile_expression(instruction[3])
+        return code(NAMESPACE)
+    if kind == 'store':
+        ss(instruction[3])
+        return session().old
+    if kind == 'convert':
+        return convert(*instruction[3])
+    if kind == 'pause':
+        print("Press [ENTER] to continue...")
+        input()
+        return None
+    if kind == 'return':
+        raise ScriptReturn(execute(instruction[3]))
+    return calculate(instruction[2])
+
+def number_range(start, stop, step=1):
+    """start, start + step, ... up to and including stop"""
+    if step == 0:
+        raise ValueError(f"{CL['red']}Range step cannot be 0{CL['reset']}")
+    if all(isinstance(v, int) for v in (start, stop, step)):
+        return range(start, stop + (1 if step > 0 else -1), step)
+    # multiply instead of adding so float steps do not drift; decimals and
+    # fractions divide exactly, floats get a little slack for rounding
+    quotient = (stop - start) / step
+    if isinstance(quotient, float):
+        quotient += 1e-9
+    count = math.floor(quotient) + 1
+    return (start + i * step for i in range(max(count, 0)))
+
+def user_function(name, parameters, body):
+    """
+    Callable running a 'def' body without echo. Arguments are stored as
+    variables while it runs; the result is the 'return' value or the last
+    line's result.
+    """
+    def call(*args):
+        if len(args) != len(parameters):
+            raise TypeError(f"{name}() takes {len(parameters)} arguments ({len(args)} given)")
+        current = session()
+        saved = [current.store.get(p, UNSET) for p in parameters]
+        echo, current.echo = current.echo, 0
+        current.store.update(zip(parameters, args))
+        result = None
+        try:
+            for instruction, result, error in run_block(body):
+                if error is not None:
+                    raise error
+        except ScriptReturn as r:
+            result = r.value
+        finally:
+            current.echo = echo
+            for p, value in zip(parameters, saved):
+                if value is UNSET:
+                    current.store.pop(p, None)
+                else:
+                    current.store[p] = value
+        return result
+    call.__name__ = name
+    call.script_function = True
+    return call
+
+def run_block(instructions):
+    """
+    Execute instructions, yielding (instruction, result, error) for every
+    line that ran. Numbers become the last result.
+    """
+    numbers = (int, float) + EXACT_TYPES
+    for instruction in instructions:
+        kind = instruction[0]
+        try:
+            if kind == 'for':
+                name, start, stop, step, body = instruction[3]
+                if stop is None:
+                    values = execute(start)
+                else:
+                    values = number_range(execute(start), execute(stop), execute(step) if step else 1)
+                for value in values:
+                    STORE[name] = value
+                    yield from run_block(body)
+                continue
+            if kind == 'while':
+                condition, body = instruction[3]
+                while execute(condition):
+                    yield from run_block(body)
+                continue
+            if kind == 'if':
+                for condition, body in instruction[3]:
+                    if condition is None or execute(condition):
+                        yield from run_block(body)
+                        break
+                continue
+            if kind == 'def':
+                name, parameters, body = instruction[3]
+                NAMESPACE[name] = user_function(name, parameters, body)
+                continue
+            result = execute(instruction)
+        except ScriptReturn:
+            raise
+        except Exception as e:
+            yield instruction, None, e
+            continue
+        if kind != 'pause':
+            if isinstance(result, numbers):
+                session().old = result
+            yield instruction, result, None
+
+def iter_script(filename):
+    """
+    Run a script, yielding (line_num, command, result, error) for every
+    line, with the unformatted result.
+    """
+    filename = find_script(filename)
+    if filename == '-':
+        instructions = iter_instructions(sys.stdin)
+    else:
+        instructions = load_script(filename)
+    for instruction, result, error in run_block(instructions):
+        yield instruction[1], instruction[2], result, None if error is None else str(error)
+
+def iter_file(filename):
+    """
+    Run a file containing one calculator command per line
+    
+    Args:
+        filename (str): Path to the input file, '-' for stdin
+        
+    Yields:
+        tuple: (line_num, command, result, error) as each line completes,
+               result is the formatted output and error is None on success
+    """
+    for line_num, command, result, error in iter_script(filename):
+        if error is None:
+            result = format_result(result)
+        yield line_num, command, result, error
+
 def process_file(filename, verbose=False):
     """
     Process a file containing one calculator command per line
@@ -1149,105 +3112,826 @@ def process_file(filename, verbose=False):
     Returns:
         dict: Results of all commands with line numbers
     """
-    global ECHO
     results = {}
-    filename = filename.strip()
-    
-    if not os.path.isfile(filename):
-        if os.path.isfile(filename+'.calc'):
-            filename = filename+'.calc'
+    for line_num, command, result, error in iter_file(filename):
+        if error is None:
+            results[line_num] = {'command': command, 'result': result, 'success': True}
+            if verbose and session().echo == 1:
+                print(result)
         else:
-            return None
-    
-    try:
-        with open(filename, 'r') as f:
-            for line_num, line in enumerate(f, 1):
-                # Clean and validate the line
-                line = line.strip()
-                if not line:
-                    continue  # Skip empty lines and comments
-                    
-                if line.startswith('#'):
-                    #print(line)
-                    continue
-                elif line.startswith('pause'):
-                    print("Press [ENTER] to continue...")
-                    input()
-                    continue
-                    
-                
-                #if verbose and ECHO == 1:
-                    #print(f"\nProcessing line {line_num}: {line}")
-                 #   print(f"{line_num}: {line}")
-                
-                # Process the command
-                try:
-                    result = evaluate_expression(line)
-                    formatted = format_result(result)
-                    results[line_num] = {
-                        'command': line,
-                        'result': formatted,
-                        'success': True
-                    }
-                    
-                    if verbose and ECHO == 1:
-                        print(formatted)
-            
-                except Exception as e:
-                    results[line_num] = {
-                        'command': line,
-                        'error': str(e),
-                        'success': False
-                    }
-                    
-                    if verbose:
-                        print(f"Error: {e}")
-    
-    except FileNotFoundError:
-        raise ValueError(f"File not found: {filename}")
-    except Exception as e:
-        raise ValueError(f"Error processing file: {str(e)}")
-    
+            results[line_num] = {'command': command, 'error': error, 'success': False}
+            if verbose:
+                print(f"Error: {error}")
     return results
 
+def run_file(filename, verbose=False):
+    """Run a file, printing results and errors as each line completes"""
+    for line_num, command, result, error in iter_script(filename):
+        if error is not None:
+            print(f"{CL['red']}Line {line_num}{CL['reset']}: {command}")
+            print(f"  Error: {error}", flush=True)
+        elif verbose and session().echo == 1:
+            print(format_result(result), flush=True)
+
 def executefile(filename):
     try:
-        results = process_file(filename,True)
-        errors = {k:v for k,v in results.items() if not v['success']}
-        if errors:
-            print("\nErrors occurred:")
-            for line_num, data in errors.items():
-                print(f"Line {line_num}: {data['command']}")
-                print(f"  Error: {data['error']}")
-        return
+        run_file(filename, True)
     except ValueError as e:
         print(str(e))
+
+# --- Sessions ---
+# A session file holds the stored variables, the last result and the input
+# history. Layout, little endian:
+#   header: magic, format version, number of entries    (SESSION_HEADER)
+#   entry:  kind, name length, payload length, name, payload   (SESSION_ENTRY)
+# The last result is the entry with an empty name; history lines have the
+# HISTORY kind. Arrays are stored as their raw bytes.
+
+SESSION_MAGIC = b'CALCSESS'
+SESSION_FORMAT = 1
+SESSION_HEADER = '<8sHI'
+SESSION_ENTRY = '<BHI'
+SESSION_EXT = '.session'
+INT, FLOAT, STRING, BIGINT, DECIMAL, FRACTION, INTS, FLOATS, HISTORY = range(9)
+
+# history read from a session before readline is loaded
+PENDING_HISTORY = []
+
+def session_path(name):
+    name = str(name).strip()
+    return name if os.path.splitext(name)[1] else name + SESSION_EXT
+
+def encode_value(value):
+    """(kind, payload bytes) of a stored value, None if it cannot be saved"""
+    import struct
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        if -2**63 <= value < 2**63:
+            return INT, struct.pack('<q', value)
+        return BIGINT, str(value).encode()
+    if isinstance(value, float):
+        return FLOAT, struct.pack('<d', value)
+    if isinstance(value, str):
+        return STRING, value.encode()
+    if isinstance(value, array) and value.typecode in 'qd':
+        if sys.byteorder != 'little':
+            value = array(value.typecode, value)
+            value.byteswap()
+        return (INTS if value.typecode == 'q' else FLOATS), value.tobytes()
+    kind = {'Decimal': DECIMAL, 'Fraction': FRACTION}.get(type(value).__name__)
+    if kind is not None:
+        return kind, str(value).encode()
+    return None
+
+def decode_value(kind, payload):
+    """Stored value from an entry payload (a memoryview)"""
+    import struct
+    if kind == INT:
+        return struct.unpack('<q', payload)[0]
+    if kind == FLOAT:
+        return struct.unpack('<d', payload)[0]
+    if kind == STRING:
+        return str(payload, 'utf-8')
+    if kind == BIGINT:
+        return int(str(payload, 'ascii'))
+    if kind == DECIMAL:
+        import decimal
+        return decimal.Decimal(str(payload, 'ascii'))
+    if kind == FRACTION:
+        import fractions
+        return fractions.Fraction(str(payload, 'ascii'))
+    if kind in (INTS, FLOATS):
+        value = array('q' if kind == INTS else 'd')
+        value.frombytes(payload)
+        if sys.byteorder != 'little':
+            value.byteswap()
+        return value
+    raise ValueError(f"unknown entry kind {kind}")
+
+def history_lines():
+    """Input history of this session"""
+    if 'readline' not in sys.modules:
+        return list(PENDING_HISTORY)
+    import readline
+    return [readline.get_history_item(i) for i in range(1, readline.get_current_history_length() + 1)]
+
+def save_session(name):
+    """Save stored variables, the last result and the input history"""
+    import struct
+    path = session_path(name)
+    entry = struct.Struct(SESSION_ENTRY)
+    store = session().store
+    items = [('', session().old)] + [(var, store.packed(var)) for var in store]
+    items += [(None, line) for line in history_lines()]
+    data = []
+    skipped = []
+    for key, value in items:
+        encoded = (HISTORY, value.encode()) if key is None else encode_value(value)
+        if encoded is None:
+            if key:
+                skipped.append(key)
+            continue
+        kind, payload = encoded
+        key = (key or '').encode()
+        data += (entry.pack(kind, len(key), len(payload)), key, payload)
+    # write next to the target and rename, so a failed save keeps the old file
+    with open(path + '.tmp', 'wb') as f:
+        f.write(struct.pack(SESSION_HEADER, SESSION_MAGIC, SESSION_FORMAT, len(data) // 3))
+        f.write(b''.join(data))
+    os.replace(path + '.tmp', path)
+    message = f"{CL['green']}Saved{CL['reset']} {len(STORE) - len(skipped)} variables to {path}"
+    if skipped:
+        message += f"\n{CL['yellow']}Not saved{CL['reset']}: {', '.join(skipped)}"
+    return message
+
+def load_session(name):
+    """Replace stored variables, the last result and the history with a saved session"""
+    import mmap
+    import struct
+    path = session_path(name)
+    header = struct.Struct(SESSION_HEADER)
+    entry = struct.Struct(SESSION_ENTRY)
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < header.size:
+            raise ValueError(f"{CL['red']}Not a session file{CL['reset']}: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            view = memoryview(m)
+            try:
+                magic, version, count = header.unpack_from(view)
+                if magic != SESSION_MAGIC or version != SESSION_FORMAT:
+                    raise ValueError(f"{CL['red']}Not a session file{CL['reset']}: {path}")
+                values = {}
+                history = []
+                pos = header.size
+                end = len(view)
+                next_entry = entry.unpack_from
+                # numbers are read in place, other kinds through decode_value
+                number_at = {INT: struct.Struct('<q').unpack_from, FLOAT: struct.Struct('<d').unpack_from}
+                for _ in range(count):
+                    kind, key_size, size = next_entry(view, pos)
+                    pos += entry.size
+                    key = m[pos:pos + key_size].decode()
+                    pos += key_size
+                    if pos + size > end:
+                        raise struct.error("entry past end of file")
+                    if kind in number_at:
+                        values[key] = number_at[kind](view, pos)[0]
+                    elif kind == HISTORY:
+                        history.append(m[pos:pos + size].decode())
+                    else:
+                        payload = view[pos:pos + size]
+                        values[key] = decode_value(kind, payload)
+                        payload.release()
+                    pos += size
+            except struct.error:
+                raise ValueError(f"{CL['red']}Corrupt session file{CL['reset']}: {path}") from None
+            finally:
+                view.release()
+    session().old = values.pop('', 0)
+    STORE.clear()
+    STORE.update(values)
+    PENDING_HISTORY[:] = history
+    if 'readline' in sys.modules:
+        import readline
+        readline.clear_history()
+        for line in history:
+            readline.add_history(line)
+    return f"{CL['green']}Loaded{CL['reset']} {len(values)} variables from {path}"
+
+class Namespace(dict):
+    """
+    Persistent evaluation namespace.
+    Functions and constants are registered once; entries in `dynamic`
+    are computed only when an expression actually references them.
+    """
+    def __init__(self, static, dynamic):
+        super().__init__(static)
+        self.dynamic = dynamic
+
+    def __missing__(self, key):
+        if key in self.dynamic:
+            return self.dynamic[key]()
+        raise KeyError(key)
+
+FUNCTIONS = {
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'sqrt': math.sqrt,
+    'log': math.log,
+    'log10': math.log10,
+    'log2': math.log2,
+    'exp': math.exp,
+    'radians': math.radians,
+    'degrees': math.degrees,
+    'pi': math.pi,
+    'phi': 1.61803398874989484820,
+    'tau':math.tau,
+    'crc32': crc32, 'md5': md5, 'sha256': sha256, 'hashfile': hashfile, 'hash': hashtext,
+    'oct': tooct,
+    'hex': tohex,
+    'curt': curt,
+    'shl': lambda x, y: x << y,  # Left shift
+    'shr': lambda x, y: x >> y,  # Right shift
+    'e': math.e,
+    'hex2rgb': hex2rgb,
+    'rgb2hex': rgb2hex,
+    'rgb2hsl': rgb2hsl,
+    'hsl2rgb': hsl2rgb,
+    'palette': palette,
+    'len': slen,
+    'length': slen,
+    'repeat': repeat,
+    'px2cm': pixels_to_cm,
+    'cm2px': cm_to_pixels,
+    'DPI_SCREEN': 96,
+    'DPI_PRINT': 300,
+    'wavelength': wavelength,
+    'roman': roman,
+    'base64': encode_base64,
+    'decodebase64': decode_base64,
+    'leap' : is_leap,
+    'weekday' : weekday_name,
+    'random' : random_int,
+    'monthdays' : monthdays,
+    'addpercent' : addpercent,
+    'subpercent' : subpercent,
+    'cal' : cal,
+    'prime' : is_prime,
+    'factor' : factor,
+    'nextprime' : nextprime,
+    'primes' : primes,
+    'ss' : ss,
+    'rs' : rs,
+    'store' : ss,
+    'restore' : rs,
+    'file' : executefile,
+    'save' : save_session,
+    'load' : load_session,
+    'write': write,
+    'set' : setvar,
+    'print': write,
+    'daysbetween': days_between,
+    'adddays': add_days,
+    'dayofyear': day_of_year,
+    'weeknumber': week_number,
+    'weekend': is_weekend,
+    'businessdays': business_days,
+    'weekends': weekends,
+    'date2unix': date_to_unix,
+    'unix2date': unix_to_date,
+    'unix2gregorian': unix_to_gregorian,
+    'unix2julian': unix_to_julian
+}
+
+# values that depend on the current state, resolved on lookup
+DYNAMIC = {
+    'result': lambda: session().old,
+    'big': lambda: big_numbers(str(session().old)),
+    'b': lambda: big_numbers(str(session().old)),
+    'dpi_presets': show_dpi_presets,
+    'now'  : datetime.datetime.now,
+    'date' : lambda: datetime.datetime.now().strftime('%Y-%m-%d'),
+    'year' : lambda: datetime.datetime.now().year,
+    'month' : lambda: datetime.datetime.now().month,
+    'time' : lambda: time.strftime('%H:%M', time.localtime()),
+    'var' : show_all,
+    'vars' : show_all
+}
+
+NAMESPACE = Namespace(FUNCTIONS, DYNAMIC)
+
+# --- Batch evaluation ---
+
+# numpy ufuncs used in place of the scalar math functions. Only functions
+# whose one argument form matches the scalar one: curt of a negative float
+# is complex, numpy.cbrt would be real.
+VECTOR_FUNCTIONS = {
+    'sin': 'sin', 'cos': 'cos', 'tan': 'tan', 'sqrt': 'sqrt',
+    'log': 'log', 'log10': 'log10', 'log2': 'log2', 'exp': 'exp',
+    'radians': 'radians', 'degrees': 'degrees',
+}
+
+def vector_function(ufunc):
+    """
+    A ufunc taking exactly one argument. A second one would be numpy's out
+    array, not log's base, so such calls fail and run row by row instead.
+    """
+    return lambda x: ufunc(x)
+
+class Scope(dict):
+    """Variables layered on top of a parent namespace"""
+    def __init__(self, parent, values=()):
+        super().__init__(values)
+        self.parent = parent
+
+    def __missing__(self, key):
+        return self.parent[key]
+
+def load_numpy():
+    """Return the numpy module, or None if it is not installed"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def parse_number(text):
+    """Convert an input field to int or float, leaving other text as is"""
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+def expression_names(source):
+    """All names an expression reads, in order of appearance"""
+    names = []
+    nodes = [n for n in ast.walk(ast.parse(source, '<string>', 'eval')) if isinstance(n, ast.Name)]
+    for node in sorted(nodes, key=lambda n: n.col_offset):
+        if node.id not in names:
+            names.append(node.id)
+    return names
+
+def free_variables(source):
+    """Names an expression reads that the namespace does not provide"""
+    return [n for n in expression_names(source)
+            if n not in NAMESPACE and n not in NAMESPACE.dynamic]
+
+def read_chunks(stream, source, chunk_size=BATCH_CHUNK):
+    """
+    Read rows of values for the variables of `source` from CSV or newline
+    separated input. A header line selects columns by name (and may shadow
+    built-in names), otherwise the free variables take the columns in order.
+    Yields (names, rows) with at most chunk_size rows at a time.
+    """
+    names = None
+    columns = None
+    parsers = None
+    chunk = []
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = [f.strip() for f in line.split(',')]
+        if columns is None:
+            if all(f.isidentifier() for f in fields):
+                referenced = expression_names(source)
+                names = [f for f in fields if f in referenced]
+                missing = [n for n in free_variables(source) if n not in names]
+                if missing:
+                    raise ValueError(f"{CL['red']}Missing input column{CL['reset']}: {', '.join(missing)}")
+                columns = [fields.index(n) for n in names]
+                continue
+            names = free_variables(source)
+            if len(fields) < len(names):
+                raise ValueError(f"{CL['red']}Expected {len(names)} columns{CL['reset']}: {', '.join(names)}")
+            columns = list(range(len(names)))
+        if parsers is None:
+            # guess each numeric column's type once, fall back per field when
+            # it changes; text columns are parsed field by field
+            parsers = [type(v) if type(v) in (int, float) else parse_number
+                       for v in (parse_number(fields[i]) for i in columns)]
+        try:
+            chunk.append([parse(fields[i]) for parse, i in zip(parsers, columns)])
+        except ValueError:
+            chunk.append([parse_number(fields[i]) for i in columns])
+        if len(chunk) >= chunk_size:
+            yield names, chunk
+            chunk = []
+    if chunk:
+        yield names, chunk
+
+def evaluate_chunk(code, names, rows, numpy=None, vector_scope=None):
+    """Evaluate compiled code for every row, vectorized when numpy is given"""
+    if numpy is not None and names:
+        try:
+            columns = []
+            for column in zip(*rows):
+                # integers stay Python ints so large results do not wrap around
+                if all(isinstance(v, int) for v in column):
+                    columns.append(numpy.array(column, dtype=object))
+                else:
+                    columns.append(numpy.array(column, dtype=float))
+            vector_scope.update(zip(names, columns))
+            with numpy.errstate(all='raise'):
+                values = code(vector_scope)
+            if isinstance(values, numpy.ndarray) and values.shape == (len(rows),):
+                return values.tolist()
+        except Exception:
+            pass  # not vectorizable, evaluate row by row
+
+    scope = Scope(NAMESPACE)
+    results = []
+    for row in rows:
+        for name, value in zip(names, row):
+            scope[name] = value
+        try:
+            results.append(code(scope))
+        except Exception as e:
+            results.append(f"{CL['red']}Error{CL['reset']}: {str(e)}")
+    return results
+
+def batch_evaluate(expr, stream, chunk_size=BATCH_CHUNK):
+    """
+    Evaluate one formula over every row of an input stream.
+    The variables of the formula are bound to the input columns.
+    Yields the results chunk by chunk.
+    """
+    source = auto_quote(expr.strip()).replace('^', '**')
+    code = compile_expression(source)
+    numpy = load_numpy()
+    vector_scope = None
+    if numpy is not None:
+        vector_scope = Scope(NAMESPACE, {name: vector_function(getattr(numpy, func))
+                                              for name, func in VECTOR_FUNCTIONS.items()})
+    for names, rows in read_chunks(stream, source, chunk_size):
+        yield evaluate_chunk(code, names, rows, numpy, vector_scope)
+
+def write_chunks(chunks, verbose=False):
+    """Write chunks of results to stdout, one per line, reporting rows/sec if verbose"""
+    start = time.perf_counter()
+    count = 0
+    for results in chunks:
+        sys.stdout.write('\n'.join(map(str, results)) + '\n')
+        count += len(results)
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f"{count} rows in {elapsed:.3f}s ({count / max(elapsed, 1e-9):,.0f} rows/sec)", file=sys.stderr)
+
+def run_batch(expr, path='-', chunk_size=BATCH_CHUNK, verbose=False):
+    """Stream the results of a batch evaluation to stdout"""
+    stream = open_input(path)
+    try:
+        write_chunks(batch_evaluate(expr, stream, chunk_size), verbose)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+# --- Bulk unit conversion ---
+
+def parse_units(spec):
+    """Split a conversion like 'km to mi' into its two units"""
+    parts = CONVERSION_SPLIT.split(spec.strip())
+    if len(parts) != 2 or not all(parts):
+        raise ValueError("Use format 'km to mi' or 'km in mi'")
+    return parts[0], parts[1]
+
+def iter_range(spec):
+    """Values of a range 'start..stop[:step]', stop included"""
+    bounds, _, step = spec.partition(':')
+    start, sep, stop = bounds.partition('..')
+    if not sep:
+        raise ValueError("Use format 'start..stop' or 'start..stop:step'")
+    start, stop, step = parse_number(start), parse_number(stop), parse_number(step or '1')
+    if not all(isinstance(v, (int, float)) for v in (start, stop, step)) or step <= 0:
+        raise ValueError(f"{CL['red']}Invalid range{CL['reset']}: {spec}")
+    return number_range(start, stop, step)
+
+def iter_fields(stream):
+    """First field of every non-empty line, skipping # comments"""
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line.split(',', 1)[0].strip()
+
+def bulk_convert(values, from_unit, to_unit, chunk_size=BATCH_CHUNK):
+    """
+    Convert a stream of values (numbers or numeric text) between two units.
+    The conversion is resolved once; yields lists of results per chunk.
+    """
+    factor, function = conversion(from_unit, to_unit)
+    values = iter(values)
+    while True:
+        chunk = list(itertools.islice(values, chunk_size))
+        if not chunk:
+            return
+        try:
+            numbers = list(map(float, chunk))
+        except ValueError:
+            numbers = [parse_number(v) for v in chunk]
+        if function is None:
+            try:
+                yield [v * factor for v in numbers]
+                continue
+            except TypeError:
+                function = lambda v: v * factor
+        results = []
+        for v in numbers:
+            try:
+                results.append(function(v))
+            except TypeError:
+                results.append(f"{CL['red']}Error{CL['reset']}: not a number: {v}")
+        yield results
+
+def run_convert(spec, path='-', range_spec=None, chunk_size=BATCH_CHUNK, verbose=False):
+    """Stream converted values from a file, stdin or a range to stdout"""
+    from_unit, to_unit = parse_units(spec)
+    if range_spec:
+        write_chunks(bulk_convert(iter_range(range_spec), from_unit, to_unit, chunk_size), verbose)
         return
+    stream = open_input(path)
+    try:
+        write_chunks(bulk_convert(iter_fields(stream), from_unit, to_unit, chunk_size), verbose)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+# --- Parallel jobs ---
+# --jobs N runs every script for every --params row in a process pool.
+# Each job starts from an empty store, echo on and the last result 0, and
+# its output is captured and printed in job order.
+
+def read_params(path):
+    """Rows of a CSV parameter file as lists of (name, value), the first line naming the variables"""
+    stream = open_input(path)
+    try:
+        lines = (line.strip() for line in stream)
+        lines = [line for line in lines if line and not line.startswith('#')]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    if not lines:
+        return []
+    names = [name.strip() for name in lines[0].split(',')]
+    if not all(name.isidentifier() for name in names):
+        raise ValueError(f"{CL['red']}The first line of {path} must name the variables{CL['reset']}: {lines[0]}")
+    rows = []
+    for line in lines[1:]:
+        fields = [parse_number(f.strip()) for f in line.split(',')]
+        if len(fields) != len(names):
+            raise ValueError(f"{CL['red']}Expected {len(names)} values{CL['reset']}: {line}")
+        rows.append(list(zip(names, fields)))
+    return rows
+
+def reset_state():
+    """Forget variables, user functions and the last result"""
+    STORE.clear()
+    session().old = 0
+    session().echo = 1
+    defined = [name for name, value in NAMESPACE.items() if getattr(value, 'script_function', False)]
+    for name in defined:
+        del NAMESPACE[name]
+    if any(name in FUNCTIONS for name in defined):
+        set_mode(NUMERIC_MODE)  # restores the built-in a def replaced
+
+def init_worker(colors, mode, precision, persist):
+    """Give a pool process the settings of the parent"""
+    global PERSIST_SCRIPTS
+    session().cl = colors
+    PERSIST_SCRIPTS = persist
+    set_mode(mode, precision)
+
+def run_job(job):
+    """
+    Run one script with a parameter row in a fresh state. The parameters
+    are stored as variables and also answer ask() prompts in order.
+    Returns (output, seconds, error).
+    """
+    import contextlib
+    filename, params, verbose = job
+    reset_state()
+    session().answers[:] = [str(value) for _, value in params]
+    STORE.update(params)
+    output = io.StringIO()
+    start = time.perf_counter()
+    error = None
+    stdin = sys.stdin
+    sys.stdin = io.StringIO()  # unanswered prompts fail instead of waiting
+    try:
+        with contextlib.redirect_stdout(output):
+            run_file(filename, verbose)
+    except Exception as e:
+        error = str(e)
+    finally:
+        sys.stdin = stdin
+    return output.getvalue(), time.perf_counter() - start, error
+
+def run_jobs(filenames, params=None, jobs=1, verbose=False):
+    """Run every script for every parameter row, jobs at a time, printing results in order"""
+    rows = read_params(params) if params else [[]]
+    work = [(filename, row, verbose) for filename in filenames for row in rows]
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+    start = time.perf_counter()
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(jobs, initializer=init_worker,
+                                   initargs=(session().cl, NUMERIC_MODE, PRECISION, PERSIST_SCRIPTS))
+        results = pool.map(run_job, work, chunksize=max(1, len(work) // (jobs * 8)))
+    else:
+        pool = None
+        results = map(run_job, work)
+    failed = 0
+    try:
+        for (filename, row, _), (output, seconds, error) in zip(work, results):
+            label = ' '.join(f"{name}={value}" for name, value in row)
+            print(f"{CL['yellow']}== {filename} {label}{CL['reset']} ({seconds:.3f}s)")
+            sys.stdout.write(output)
+            if error is not None:
+                failed += 1
+                print(f"{CL['red']}Error{CL['reset']}: {error}")
+            sys.stdout.flush()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f"{len(work)} jobs, {failed} failed, in {elapsed:.3f}s ({len(work) / max(elapsed, 1e-9):,.1f} jobs/sec)", file=sys.stderr)
+
+# --- Server mode ---
+
+def json_value(value):
+    """A result as JSON data; inf and nan, which JSON lacks, become strings"""
+    if isinstance(value, (tuple, list)):
+        return [json_value(v) for v in value]
+    if isinstance(value, float):
+        return value if math.isfinite(value) else str(value)
+    if isinstance(value, (int, str, type(None))):
+        return value
+    return str(value)
+
+def serve_reply(line):
+    """Evaluate one request line and return a JSON reply for it"""
+    import contextlib
+    import json
+    output = io.StringIO()
+    stdin = sys.stdin
+    # requests come from stdin, so ask() and pause must not read it
+    sys.stdin = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            result = calculate(line) if line else None
+            format_result(result)  # keeps the last result for the next request
+        reply = {'ok': True, 'result': json_value(result)}
+    except EOFError:
+        reply = {'ok': False, 'error': 'input is not available in serve mode'}
+    except Exception as e:
+        reply = {'ok': False, 'error': str(e)}
+    finally:
+        sys.stdin = stdin
+    if output.getvalue():
+        reply['output'] = output.getvalue()
+    return json.dumps(reply, allow_nan=False)
+
+def serve_stream(rfile, write):
+    """Answer requests line by line until EOF or quit"""
+    for line in rfile:
+        line = line.strip()
+        if line.lower() in ('quit', 'exit'):
+            break
+        write(serve_reply(line) + '\n')
+
+def serve(socket_path=None):
+    """
+    Keep one session alive and answer one expression per line,
+    from stdin or from clients of a Unix domain socket.
+    """
+    session().echo = 0
+    session().terminal = False
+    session().cl = PLAINCOLORS
+    if socket_path is None:
+        def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        serve_stream(sys.stdin, write)
+        return
+
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lines = io.TextIOWrapper(self.rfile, encoding='utf-8')
+            def write(text):
+                self.wfile.write(text.encode())
+                self.wfile.flush()
+            serve_stream(lines, write)
+
+    import stat
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        pass
+    else:
+        # only replace a socket left behind by an earlier server
+        if not stat.S_ISSOCK(mode):
+            raise ValueError(f"{CL['red']}Not a socket, refusing to replace it{CL['reset']}: {socket_path}")
+        os.unlink(socket_path)
+    with socketserver.UnixStreamServer(socket_path, Handler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
 
 def main():
-    global CL,ECHO
+    global PERSIST_SCRIPTS
+    argv = sys.argv[1:]
+    if argv and not any(arg.startswith('-') for arg in argv):
+        # A plain expression needs no argument parsing
+        session().cl = COLORS
+        print(format_result(evaluate_expression(' '.join(argv))))
+        return
+    
     args = parse_args()
     
-    if args.no_color:
-        CL=NOCOLORS
+    if args.serve:
+        session().cl = PLAINCOLORS
+    elif args.no_color:
+        session().cl = NOCOLORS
     else:
-        CL=COLORS
+        session().cl = COLORS
+    EXPR_CACHE.resize(args.cache_size)
+    if args.script_cache:
+        PERSIST_SCRIPTS = True
+    if args.precision is not None:
+        set_mode(args.mode or 'decimal', args.precision)
+    elif args.mode:
+        set_mode(args.mode)
+    if args.session:
+        if os.path.exists(session_path(args.session)):
+            try:
+                load_session(args.session)
+            except ValueError as e:
+                print(str(e))
+                return
+        import atexit
+        atexit.register(save_session, args.session)
+    
+    if args.serve:
+        try:
+            serve(args.socket)
+        except (ValueError, OSError) as e:
+            print(str(e))
+        return
     
+    if args.convert:
+        try:
+            run_convert(args.convert, args.input, args.range, args.chunk_size, args.verbose)
+        except (ValueError, OSError) as e:
+            print(str(e))
+        return
+
+    if args.hash:
+        try:
+            run_hash(args.hash, args.expression, args.jobs, args.verbose)
+        except ValueError as e:
+            print(str(e))
+        return
+
+    if args.encode or args.decode:
+        try:
+            run_codec(args.decode or args.encode, bool(args.decode), args.input, args.verbose)
+        except (ValueError, OSError) as e:
+            print(str(e))
+        return
+
+    if args.colors:
+        try:
+            run_colors(args.colors, args.input, args.verbose)
+        except (ValueError, OSError) as e:
+            print(str(e))
+        return
+
+    if args.timestamps:
+        try:
+            run_timestamps(args.timestamps, args.input, args.utc, args.chunk_size, args.verbose)
+        except (ValueError, OverflowError, OSError) as e:
+            print(str(e))
+        return
+
+    if args.dates:
+        try:
+            write_chunks(date_series(args.dates, args.range or '', args.chunk_size), args.verbose)
+        except ValueError as e:
+            print(str(e))
+        return
+
+    if args.batch:
+        try:
+            run_batch(args.batch, args.input, args.chunk_size, args.verbose)
+        except (ValueError, SyntaxError, OSError) as e:
+            print(str(e))
+        return
+    
+    if args.file and (len(args.file) > 1 or args.jobs not in (None, 1) or args.params):
+        try:
+            run_jobs(args.file, args.params, 1 if args.jobs is None else args.jobs, args.verbose)
+        except (ValueError, OSError) as e:
+            print(str(e))
+        return
+
     if args.file:
         try:
-            results = process_file(args.file, args.verbose)
-            if not args.verbose:
-                # Only show errors in non-verbose mode
-                errors = {k:v for k,v in results.items() if not v['success']}
-                if errors:
-                    print("\nErrors occurred:")
-                    for line_num, data in errors.items():
-                        print(f"Line {line_num}: {data['command']}")
-                        print(f"  Error: {data['error']}")
-            return
+            # Only show errors in non-verbose mode
+            run_file(args.file[0], args.verbose)
         except ValueError as e:
             print(str(e))
-            return
+        return
     
     if args.expression:
         expr = ' '.join(args.expression)
@@ -1256,7 +3940,7 @@ def main():
         return
         
     # Interactive mode
-    readline.set_completer_delims(' \t\n')  # Don't break completion on these
+    setup_readline()
     print(f"{CL['yellow']}'help' for help,  'quit' to exit{CL['reset']}")
     while True:
         try:
@@ -1265,7 +3949,7 @@ def main():
                 break
             if expr:
                 result = evaluate_expression(expr)
-                if ECHO: print(format_result(result))
+                if session().echo: print(format_result(result))
         except (KeyboardInterrupt, EOFError):
             print("\nExiting...")
             break
@@ -1274,17 +3958,70 @@ def main():
                 
 def parse_args():
     """Parse command-line arguments"""
+    import argparse
+
+    def positive(text):
+        value = int(text)
+        if value < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1: {text}")
+        return value
+
     parser = argparse.ArgumentParser(description=f'{NAME} v{VER} - Powerful Command-line Calculator')
     parser.add_argument('--no-color', action='store_true', 
                        help='disable colored output')
-    parser.add_argument('--file', type=str, help='process commands from a file')
+    parser.add_argument('--file', type=str, nargs='+', metavar='FILE',
+                       help="process commands from files, '-' for stdin")
+    parser.add_argument('--jobs', type=int, metavar='N',
+                       help='run the --file scripts in N processes (0 for every core), each job with its own variables; '
+                            'threads for --hash (default every core)')
+    parser.add_argument('--params', type=str, metavar='CSV',
+                       help='run every --file script once per row; the first line names the variables, '
+                            'values also answer ask() prompts in order')
     parser.add_argument('--verbose', action='store_true', help='show detailed processing')
+    parser.add_argument('--script-cache', action='store_true',
+                       help=f'keep compiled scripts next to them as name{SCRIPT_CACHE_EXT}')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                       help=f'number of compiled expressions to keep (default {CACHE_SIZE})')
+    parser.add_argument('--session', type=str, metavar='FILE',
+                       help='restore variables and history from FILE and save them back on exit')
+    parser.add_argument('--mode', choices=NUMERIC_MODES,
+                       help='numeric mode: float (default), decimal or fraction')
+    parser.add_argument('--precision', type=int, metavar='N',
+                       help='significant digits for decimal mode (implies --mode decimal)')
+    parser.add_argument('--batch', type=str, metavar='EXPR',
+                       help='evaluate EXPR for every row of --input, binding its free variables to the columns')
+    parser.add_argument('--hash', type=str, metavar='ALGO',
+                       help="print the ALGO hash of every file argument ('-' or none for stdin), "
+                            "ex. sha256, md5, blake2b, crc32")
+    parser.add_argument('--encode', type=str, metavar='CODEC',
+                       help='encode --input to base64, base32 or hex, streaming in chunks')
+    parser.add_argument('--decode', type=str, metavar='CODEC',
+                       help='decode base64, base32 or hex --input back to its bytes')
+    parser.add_argument('--colors', type=str, metavar='FROM2TO',
+                       help='convert every color of --input between hex, rgb and hsl, ex. rgb2hsl, hex2hsl; '
+                            'rgb input may be a PPM image')
+    parser.add_argument('--timestamps', type=str, metavar='MODE',
+                       help='convert the UNIX timestamps of --input to date, datetime, gregorian or julian')
+    parser.add_argument('--utc', action='store_true',
+                       help='--timestamps in UTC instead of local time (vectorized)')
+    parser.add_argument('--dates', type=str, metavar='SERIES',
+                       help='stream the dates of a --range of YYYY-MM-DD dates: days, weekends, businessdays, '
+                            'or date,value lines of weekday, dayofyear, weeknumber, weekend, monthdays')
+    parser.add_argument('--convert', type=str, metavar="'FROM to TO'",
+                       help="convert every value of --input or --range between units, ex. 'F to C'")
+    parser.add_argument('--range', type=str, metavar='START..STOP[:STEP]',
+                       help='values to convert instead of --input, or dates for --dates, stop included')
+    parser.add_argument('--input', type=str, default='-',
+                       help='CSV or newline separated input for --batch, --convert and --timestamps, any file for --encode/--decode/--colors (default stdin)')
+    parser.add_argument('--chunk-size', type=positive, default=BATCH_CHUNK,
+                       help=f'rows evaluated at a time in batch mode (default {BATCH_CHUNK})')
+    parser.add_argument('--serve', action='store_true',
+                       help='read one expression per line and answer each with a line of JSON, keeping variables between requests')
+    parser.add_argument('--socket', type=str, metavar='PATH',
+                       help='with --serve, listen on a Unix domain socket instead of stdin')
     parser.add_argument('expression', nargs='*', 
                        help='optional expression to evaluate')
     return parser.parse_args()
 
 if __name__ == "__main__":
-    # Initialize tab completion
-    readline.parse_and_bind("tab: complete")
-    readline.set_completer(completer)
     main()
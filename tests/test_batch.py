@@ -0,0 +1,51 @@
+"""--batch evaluation with and without numpy"""
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+CALCULUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'calculus.py')
+
+ROWS = 'x,b\n8.0,2.0\n-8.0,3.0\n27,3\n0.5,10\n'
+# every row valid, so numpy can take the whole chunk
+VALID_ROWS = 'x,b\n8.0,2.0\n9.0,3.0\n0.5,10\n'
+
+
+def batch(expr, text, numpy):
+    if not numpy:
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(calculus, 'load_numpy', lambda: None)
+            return batch(expr, text, True)
+    return [v for chunk in calculus.batch_evaluate(expr, io.StringIO(text)) for v in chunk]
+
+
+@pytest.mark.parametrize('expr', [
+    'log(x, b)', 'log(x)', 'curt(x)', 'curt(x) + b', 'sqrt(x) * sin(b)',
+    'exp(x) - log10(b)', 'x ** 2 / b', 'degrees(radians(x))',
+])
+@pytest.mark.parametrize('rows', [ROWS, VALID_ROWS])
+def test_numpy_matches_python(expr, rows):
+    pytest.importorskip('numpy')
+    assert batch(expr, rows, True) == batch(expr, rows, False)
+
+
+def test_log_base_and_negative_curt():
+    assert batch('log(x, b)', ROWS, False)[0] == pytest.approx(3.0)
+    assert isinstance(batch('curt(x)', ROWS, False)[1], complex)
+
+
+@pytest.mark.parametrize('size', ['0', '-1'])
+def test_chunk_size_must_be_positive(size):
+    done = subprocess.run([sys.executable, CALCULUS, '--batch', 'x * 2', '--chunk-size', size],
+                          input='1\n2\n', capture_output=True, text=True, timeout=30)
+    assert done.returncode == 2
+    assert 'must be at least 1' in done.stderr and not done.stdout
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
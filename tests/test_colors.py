@@ -0,0 +1,50 @@
+"""--colors conversions against the scalar color functions"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+
+@pytest.fixture(params=['python', 'numpy'])
+def numpy(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(calculus, 'load_numpy', lambda: None)
+    return request.param
+
+
+def convert(conversion, lines):
+    data = ''.join(line + '\n' for line in lines).encode()
+    return [line for chunk in calculus.convert_colors(conversion, data) for line in chunk]
+
+
+def test_hsl2rgb_matches_the_scalar_function(numpy):
+    rng = random.Random(7)
+    colors = [(rng.uniform(-360, 720), rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(500)]
+    colors += [(0, 0, 0), (0, 100, 100), (360, 100, 50), (120, 0, 37.5)]
+    expected = [','.join(map(str, calculus.hsl2rgb(*c))) for c in colors]
+    assert convert('hsl2rgb', [f'{h!r},{s!r},{l!r}' for h, s, l in colors]) == expected
+
+
+@pytest.mark.parametrize('color', [(0, 120, 50), (0, 50, -1), (0, 100.5, 50), (float('nan'), 50, 50)])
+def test_out_of_range_hsl_is_an_error_in_both(numpy, color):
+    with pytest.raises(ValueError):
+        calculus.hsl2rgb(*color)
+    with pytest.raises(ValueError):
+        convert('hsl2rgb', ['0,50,50', ','.join(map(str, color))])
+
+
+def test_rgb2hsl_matches_the_scalar_function(numpy):
+    rng = random.Random(8)
+    colors = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(500)]
+    expected = [','.join(map(str, calculus.rgb2hsl(*c))) for c in colors]
+    assert convert('rgb2hsl', [','.join(map(str, c)) for c in colors]) == expected
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
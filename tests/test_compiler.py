@@ -0,0 +1,102 @@
+"""The expression compiler against Python's own eval"""
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+NAMES = {'a': 7, 'b': -3, 'c': 2.5, 'd': 0, 't': (4, 5, 6), 'l': [1, 2, 3],
+         'abs': abs, 'min': min, 'max': max, 'round': round}
+BINARY = ['+', '-', '*', '/', '//', '%', '&', '|', '^', '<<', '>>',
+          '<', '<=', '>', '>=', '==', '!=', 'and', 'or']
+
+
+def expression(rng, depth=3):
+    """A random expression over NAMES"""
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice(['a', 'b', 'c', 'd', '1', '2', '0.5', '3', 'True', 'None'])
+    sub = lambda: expression(rng, depth - 1)
+    kind = rng.randrange(9)
+    if kind == 0:
+        return f'{rng.choice(["-", "+", "~", "not "])}({sub()})'
+    if kind == 1:
+        return f'({sub()}) ** {rng.randrange(-2, 4)}'
+    if kind == 2:
+        return f'({sub()}) if ({sub()}) else ({sub()})'
+    if kind == 3:
+        return f'{rng.choice(["abs", "round"])}({sub()})'
+    if kind == 4:
+        return f'{rng.choice(["min", "max"])}({sub()}, {sub()})'
+    if kind == 5:
+        return f'{rng.choice(["t", "l"])}[{rng.randrange(-3, 3)}]'
+    if kind == 6:
+        return f'({sub()}) < ({sub()}) <= ({sub()})'
+    if kind == 7:
+        return f'({sub()}) in ({sub()}, {sub()})'
+    return f'({sub()}) {rng.choice(BINARY)} ({sub()})'
+
+
+def outcome(function):
+    """The value of function(), or the type of the exception it raised"""
+    try:
+        return function()
+    except Exception as e:
+        return type(e)
+
+
+def same(x, y):
+    if isinstance(x, float) and isinstance(y, float) and math.isnan(x):
+        return math.isnan(y)
+    return x == y and type(x) is type(y)
+
+
+def test_random_expressions_match_eval():
+    rng = random.Random(2024)
+    for _ in range(3000):
+        source = expression(rng)
+        compiled = outcome(lambda: calculus.compile_expression(source)(dict(NAMES)))
+        expected = outcome(lambda: eval(source, {'__builtins__': {}}, dict(NAMES)))
+        assert same(compiled, expected), source
+
+
+@pytest.mark.parametrize('source', [
+    '1 + 2 * 3 - 4 / 5', '7 // -2', '-7 % 3', '2 ** -1', '-2 ** 2', '2 ** 3 ** 2',
+    '1 < 2 < 3', '3 > 2 > 2', '1 == 1.0 != 2', 'not 0 and 5', '0 or "" or 3',
+    '5 if 0 else 6', '~5 ^ 3 | 8 & 12 << 1 >> 2', 'l[1:]', 't[::-1]', 'l[-1]',
+    '2 in l', '4 not in t', '(1, [2, 3])', 'max(1, 3, 2)', 'round(2.675, 2)',
+    'min(t)', 'a / d', '1e308 * 10', 'True + True', 'None',
+])
+def test_operators_match_eval(source):
+    compiled = outcome(lambda: calculus.compile_expression(source)(dict(NAMES)))
+    expected = outcome(lambda: eval(source, {'__builtins__': {}}, dict(NAMES)))
+    assert same(compiled, expected)
+
+
+def test_names():
+    compiled = calculus.compile_expression('a * x')
+    assert compiled({'a': 2, 'x': 5}) == 10
+    with pytest.raises(NameError):
+        compiled({'a': 2})
+    # names are looked up when the expression runs, not when it is compiled
+    assert compiled({'a': 'ab', 'x': 2}) == 'abab'
+    with pytest.raises(NameError):
+        calculus.compile_expression('__import__("os")')({})
+
+
+@pytest.mark.parametrize('source', [
+    '().__class__', '().__class__.__bases__[0].__subclasses__()', 'a.real',
+    'lambda: 1', '(lambda x: x)(1)', '[x for x in l]', '{x for x in l}',
+    '{x: 1 for x in l}', '(x for x in l)', 'sum(x for x in l)', '(y := 1)',
+    'f"{a}"', '{1: 2}', '{1, 2}', 'max(*l)', 'max(**{})', 'max(*l, 1)',
+])
+def test_rejected(source):
+    with pytest.raises(ValueError):
+        calculus.compile_expression(source)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
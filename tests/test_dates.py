@@ -0,0 +1,48 @@
+"""Date parsing and the --dates series"""
+import datetime
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+
+def series(name, spec):
+    return [line for chunk in calculus.date_series(name, spec) for line in chunk]
+
+
+def test_unpadded_dates():
+    assert calculus.parse_date('2025-5-4') == datetime.date(2025, 5, 4)
+    assert calculus.add_days('2024-2-28', 1) == '2024-02-29'
+
+
+@pytest.mark.parametrize('step', ['-1', '0', 'x'])
+def test_invalid_steps(step):
+    with pytest.raises(ValueError):
+        series('days', f'2024-01-01..2024-01-10:{step}')
+
+
+@pytest.mark.parametrize('name', ['weekends', 'businessdays'])
+def test_step_rejected_for_week_series(name):
+    with pytest.raises(ValueError):
+        series(name, '2024-01-01..2024-01-31:2')
+
+
+def test_series_end_at_the_last_date():
+    assert series('days', '9999-12-25..9999-12-31:3') == ['9999-12-25', '9999-12-28', '9999-12-31']
+    assert series('weekends', '9999-12-20..9999-12-31') == ['9999-12-25', '9999-12-26']
+
+
+def test_weekends_and_business_days_match_a_day_loop():
+    start = datetime.date(2023, 12, 1)
+    for length in range(40):
+        stop = start + datetime.timedelta(days=length)
+        days = [start + datetime.timedelta(days=i) for i in range(length + 1)]
+        assert list(calculus.iter_weekends(start, stop)) == [d for d in days if d.weekday() >= 5]
+        assert calculus.business_days(start, stop) == sum(d.weekday() < 5 for d in days[:-1])
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
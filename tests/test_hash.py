@@ -0,0 +1,59 @@
+"""Hashing of stdin, pipes and files against the coreutils sums"""
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+CALCULUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'calculus.py')
+DATA = b'hi\n' + bytes(range(256)) * 5000
+
+
+def calculus(*args, stdin=b''):
+    return subprocess.run([sys.executable, CALCULUS, '--no-color', *args],
+                          input=stdin, capture_output=True, check=True).stdout.decode()
+
+
+def expected(algorithm, data):
+    tool = shutil.which(f'{algorithm}sum')
+    if tool:
+        return subprocess.run([tool], input=data, capture_output=True, check=True).stdout.split()[0].decode()
+    return hashlib.new(algorithm, data).hexdigest()
+
+
+@pytest.mark.parametrize('algorithm', ['md5', 'sha256'])
+def test_stdin(algorithm):
+    assert calculus('--hash', algorithm, stdin=DATA).split() == [expected(algorithm, DATA), '-']
+
+
+@pytest.mark.parametrize('algorithm', ['md5', 'sha256'])
+def test_files_and_empty(tmp_path, algorithm):
+    full = tmp_path / 'full'
+    full.write_bytes(DATA)
+    empty = tmp_path / 'empty'
+    empty.write_bytes(b'')
+    lines = calculus('--hash', algorithm, str(full), str(empty)).splitlines()
+    assert lines == [f'{expected(algorithm, DATA)}  {full}', f'{expected(algorithm, b"")}  {empty}']
+
+
+@pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='needs named pipes')
+def test_fifo(tmp_path):
+    import threading
+    fifo = tmp_path / 'fifo'
+    os.mkfifo(fifo)
+
+    def feed():
+        with open(fifo, 'wb') as f:
+            f.write(DATA)
+    writer = threading.Thread(target=feed)
+    writer.start()
+    try:
+        assert calculus('--hash', 'sha256', str(fifo)).split()[0] == expected('sha256', DATA)
+    finally:
+        writer.join()
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,81 @@
+"""Numeric modes and lines continuing the last result"""
+import os
+import sys
+import threading
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+
+@pytest.fixture
+def mode():
+    yield calculus.set_mode
+    calculus.set_mode('float')
+
+
+def run(lines):
+    session = calculus.Session()
+    result = None
+    for line in lines:
+        result = session.calculate(line)
+        session.format(result)
+    return result
+
+
+def test_float_continuation(mode):
+    assert run(['5', '+3', '*2', '-1', '^2']) == 225
+
+
+def test_fraction_continuation(mode):
+    mode('fraction')
+    assert run(['2/3', '^2']) == Fraction(4, 9)
+
+
+def test_decimal_continuation_keeps_precision(mode):
+    mode('decimal')
+    assert run(['10**30/7', '*7']) == Decimal('1.000000000000000000000000000E+30')
+    assert run(['1/3', '*3']) == Decimal('0.9999999999999999999999999999')
+
+
+@pytest.mark.parametrize('name, total', [
+    ('float', 14.5), ('decimal', Decimal('14.5')), ('fraction', Fraction(29, 2)),
+])
+def test_loops_over_ranges(mode, tmp_path, capsys, name, total):
+    mode(name)
+    script = tmp_path / 'loop.calc'
+    script.write_text('0\n@s\nfor i in 0.5..2.5\ns + i\n@s\nend\n'
+                      'for i in 3..1:-0.5\ns + i\n@s\nend\n')
+    session = calculus.Session()
+    session.run_file(str(script))
+    assert 'Error' not in capsys.readouterr().out
+    assert session.store['s'] == total
+    assert type(session.store['s']) is type(total)
+
+
+@pytest.mark.parametrize('name', ['decimal', 'fraction'])
+def test_floor_division_matches_float(mode, name):
+    sources = ['(-7) // 2', '(-7) % 2', '7 // -2', '7 % -2', '(-7.5) // 2', '(-7.5) % 2',
+               '7.5 % -2', '(-6) // 3', '(-6) % 3', '(-7) % 0.5', '7 % -0.5']
+    mode('float')
+    expected = [run([source]) for source in sources]
+    mode(name)
+    assert [float(run([source])) for source in sources] == expected
+
+
+def test_decimal_precision_in_other_threads(mode):
+    mode('decimal', 10)
+    results = []
+    worker = threading.Thread(target=lambda: results.append(
+        [run([line]) for line in ('1/3', '-(2/3)', 'sqrt(2)', '2**0.5', '10//3', 'pi')]))
+    worker.start()
+    worker.join()
+    assert results == [[Decimal('0.3333333333'), Decimal('-0.6666666667'), Decimal('1.414213562'),
+                        Decimal('1.414213562'), Decimal('3'), Decimal('3.141592654')]]
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,58 @@
+"""--serve replies: one valid JSON line per request, no terminal access"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+CALCULUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'calculus.py')
+
+
+def serve(requests):
+    out = subprocess.run([sys.executable, CALCULUS, '--serve'], input=''.join(r + '\n' for r in requests),
+                         capture_output=True, text=True, timeout=30, check=True).stdout
+    return [json.loads(line, parse_constant=pytest.fail) for line in out.splitlines()]
+
+
+def test_ask_does_not_take_the_next_request():
+    replies = serve(['ask(x)', '1+1'])
+    assert len(replies) == 2
+    assert not replies[0]['ok']
+    assert replies[1] == {'ok': True, 'result': 2}
+
+
+def test_cls_is_an_error_reply():
+    replies = serve(['cls', '2*3'])
+    assert not replies[0]['ok'] and 'output' not in replies[0]
+    assert replies[1]['result'] == 6
+
+
+def test_infinity_and_nan_are_strings():
+    replies = serve(['1e308*10', '[1.5, 0*1e400]'])
+    assert replies[0]['result'] == 'inf'
+    assert replies[1]['result'] == [1.5, 'nan']
+
+
+def test_replies_have_no_escape_codes(tmp_path):
+    session = tmp_path / 'plain'
+    requests = ['set("a", 5)', f'save("{session}")', 'load(missing-session)', 'print("{red}hi")',
+                '1/0', 'unknown', 'var', 'cache', '1 km to kg', 'prime(7)']
+    out = subprocess.run([sys.executable, CALCULUS, '--serve'], input=''.join(r + '\n' for r in requests),
+                         capture_output=True, text=True, timeout=30, check=True).stdout
+    assert len(out.splitlines()) == len(requests)
+    assert '\\u001b' not in out and '\x1b' not in out
+    assert 'Saved 1 variables' in out
+
+
+def test_socket_path_is_not_a_regular_file(tmp_path):
+    path = tmp_path / 'precious.txt'
+    path.write_text('keep')
+    out = subprocess.run([sys.executable, CALCULUS, '--serve', '--socket', str(path)],
+                         capture_output=True, text=True, timeout=30).stdout
+    assert 'Not a socket' in out
+    assert path.read_text() == 'keep'
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,58 @@
+"""Sessions entered from several threads"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+
+def test_threads_entering_one_session():
+    shared = calculus.Session()
+    entered = threading.Barrier(2)
+    exited = threading.Barrier(2)
+    results = {}
+
+    def work(index, own):
+        with own:
+            with shared:
+                entered.wait()
+                if index:
+                    exited.wait()
+            if not index:
+                exited.wait()
+            results[index] = calculus.session() is own
+        results[index, 'default'] = calculus.session() is calculus.DEFAULT_SESSION
+
+    threads = [threading.Thread(target=work, args=(i, calculus.Session())) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {0: True, 1: True, (0, 'default'): True, (1, 'default'): True}
+
+
+def test_symbols_get_distinct_slots():
+    names = [f'thread_symbol_{i}' for i in range(2000)]
+    barrier = threading.Barrier(4)
+
+    def allocate(order):
+        barrier.wait()
+        for name in order:
+            calculus.symbol(name)
+
+    threads = [threading.Thread(target=allocate, args=(names if i % 2 else names[::-1],))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    slots = [calculus.SYMBOLS[name] for name in names]
+    assert len(set(slots)) == len(slots)
+    assert sorted(calculus.SYMBOLS.values()) == list(range(len(calculus.SYMBOLS)))
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
@@ -0,0 +1,45 @@
+"""Startup stays cheap: optional modules are imported on first use"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# imported inside the functions that need them
+LAZY = ['readline', 'hashlib', 'binascii', 'colorsys', 'calendar', 'base64', 'random',
+        'argparse', 'json', 'decimal', 'fractions', 'struct', 'socketserver', 'numpy',
+        'concurrent.futures', 'zlib']
+
+PROBE = '''
+import json, sys
+before = set(sys.modules)
+sys.path.insert(0, {root!r})
+sys.argv = ['calculus.py'] + {argv!r}
+import calculus
+if sys.argv[1:]:
+    calculus.main()
+print(json.dumps(sorted(set(sys.modules) - before)))
+'''
+
+
+def loaded(argv):
+    """Modules a fresh interpreter imports for calculus and a command line"""
+    out = subprocess.run([sys.executable, '-c', PROBE.format(root=ROOT, argv=argv)],
+                         capture_output=True, text=True, timeout=60, check=True).stdout
+    return set(json.loads(out.splitlines()[-1]))
+
+
+@pytest.mark.parametrize('argv', [[], ['2+2'], ['sin(1)*3']])
+def test_optional_modules_are_not_imported(argv):
+    assert loaded(argv).isdisjoint(LAZY)
+
+
+def test_modules_load_when_used():
+    assert 'hashlib' in loaded(['md5(hi)'])
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
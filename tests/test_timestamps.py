@@ -0,0 +1,69 @@
+"""Batch timestamp conversion"""
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+
+@pytest.fixture(params=['python', 'numpy'])
+def numpy(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(calculus, 'load_numpy', lambda: None)
+    return request.param
+
+
+def convert(mode, text, utc=True, chunk_size=calculus.BATCH_CHUNK):
+    chunks = calculus.convert_timestamps(mode, io.StringIO(text), utc, chunk_size)
+    return [line for chunk in chunks for line in chunk]
+
+
+@pytest.mark.parametrize('utc', [True, False])
+def test_bad_rows_become_error_lines(numpy, utc):
+    lines = convert('julian' if utc else 'date', '0\n# comment\n\nabc\n86400,x\nnan\n', utc)
+    assert len(lines) == 4
+    assert lines[1].endswith('not a timestamp: abc')
+    assert lines[3].endswith('not a timestamp: nan')
+    if utc:
+        assert lines[0] == '2440588.000000'
+        assert lines[2] == '2440589.000000'
+
+
+def test_error_lines_keep_the_rest_of_the_chunk(numpy):
+    assert convert('date', '0\ninf\n86400\n', chunk_size=2) == [
+        '1970-01-01', convert('date', 'inf\n')[0], '1970-01-02']
+    assert convert('datetime', '1e30\n59\n')[1] == '1970-01-01T00:00:59'
+
+
+TIMESTAMPS = ['0', '-1.5', '1.9', '-86399.9', '1700000000.75', '253402300799', '-62135596800',
+              '9007199254740993', '1e300']
+
+
+def test_julian_matches_unix2julian(numpy):
+    lines = convert('julian', ''.join(t + '\n' for t in TIMESTAMPS), utc=False)
+    assert lines == ['%.6f' % calculus.unix_to_julian(float(t)) for t in TIMESTAMPS]
+
+
+@pytest.mark.parametrize('mode, format_str', [('date', '%Y-%m-%d'), ('datetime', '%Y-%m-%dT%H:%M:%S')])
+def test_utc_dates_match_unix2date(numpy, mode, format_str):
+    # strftime does not pad the year 1 on every platform, so stop before it
+    lines = convert(mode, ''.join(t + '\n' for t in TIMESTAMPS[:6]))
+    assert lines == [calculus.unix_to_date(float(t), format_str, 1) for t in TIMESTAMPS[:6]]
+
+
+@pytest.mark.parametrize('mode', ['date', 'datetime', 'gregorian'])
+def test_dates_past_the_calendar_are_errors(numpy, mode):
+    lines = convert(mode, '253402300800\n-62135596801\n9007199254740993\n0\n')
+    assert [line.rpartition(': ')[2] for line in lines[:3]] == [
+        '253402300800', '-62135596801', '9007199254740993']
+    assert all('not a timestamp' in line for line in lines[:3])
+    assert len(lines) == 4 and 'not a timestamp' not in lines[3]
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
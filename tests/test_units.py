@@ -0,0 +1,21 @@
+"""Unit names, prefixes and conversions"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+
+@pytest.mark.parametrize('from_unit, to_unit, expected', [
+    ('Mm', 'm', 1e6), ('Mg', 'kg', 1e3), ('mm', 'm', 1e-3), ('mg', 'g', 1e-3),
+    ('MB', 'B', 1024**2), ('mb', 'kb', 1024), ('KiB', 'B', 1024), ('Gbit', 'MB', 1e9 / 8 / 1024**2),
+    ('ms', 's', 1e-3), ('km/h', 'm/s', 1 / 3.6),
+])
+def test_conversion_factors(from_unit, to_unit, expected):
+    assert calculus.convert(1, from_unit, to_unit) == pytest.approx(expected)
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))
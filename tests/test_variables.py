@@ -0,0 +1,64 @@
+"""Stored variables used by name"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import calculus  # noqa: E402
+
+
+def run(session, lines):
+    result = None
+    for line in lines:
+        result = session.calculate(line)
+        session.format(result)
+    return result
+
+
+def test_variables_by_name():
+    assert run(calculus.Session(), ['12', '@d', '3', '@w', 'd + w + 114']) == 129
+
+
+def test_functions_are_not_shadowed(capsys):
+    session = calculus.Session()
+    run(session, ['5', '@sin', 'set("sqrt", 2)'])
+    assert run(session, ['sin(0)']) == 0
+    assert run(session, ['sqrt(16)']) == 4
+    assert run(session, ['rs("sin") + rs("sqrt")']) == 7
+    output = capsys.readouterr().out
+    assert 'sin is a built-in function' in output
+    assert 'sqrt is a built-in function' in output
+
+
+def test_constants_are_shadowed_silently(capsys):
+    session = calculus.Session()
+    assert run(session, ['2', '@e', 'e * 10', '3', '@month', 'month']) == 3
+    run(session, ['1', '@x'])
+    assert 'Warning' not in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('value', [
+    (255, 0, 0), [1, 2, 3], [0.5, 1.5], [9007199254740993, 0.5], [2**70, 1], ['a', 1], [],
+])
+def test_stored_values_keep_their_type(value):
+    session = calculus.Session()
+    session.store['v'] = value
+    assert session.calculate('v') == value
+    assert type(session.calculate('v')) is type(value)
+    if value:
+        assert session.calculate('v[0]') == value[0]
+    assert session.calculate('rs("v")') == value
+
+
+def test_packed_lists():
+    store = calculus.VariableStore()
+    store['i'], store['f'], store['t'] = [1, 2], [0.5], (1, 2)
+    assert store.packed('i').typecode == 'q' and store.packed('f').typecode == 'd'
+    assert store.packed('t') == (1, 2)
+    session = calculus.Session()
+    session.store['v'] = [1, 2]
+    assert session.calculate('v + [3]') == [1, 2, 3]
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '-q']))